@@ -0,0 +1,193 @@
+# Benchmarks for parsing, aggregation, search and export on synthetic gazettes; results are written as JSON
+import argparse
+import gc
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from cbse_export import EXPORT_FORMATS, export_bytes
+from cbse_index import TIER_BINS, AggregateCube, FilterEngine, Rankings, SearchIndex, SubjectIndex
+from cbse_metrics import stage
+from cbse_parser import BYTE_PARSERS, PARSERS, iter_lines, parse_gazette_buffer, parse_gazette_file
+from cbse_synth import gazette_text
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# Searches timed against the search index, from selective to broad
+SEARCH_QUERIES = ["12000042", "1200", "anjali sharma", "d'sou", "kumar", "zzz"]
+
+# A combined dashboard filter: percentage range, result and a subject marks threshold
+FILTER_PREDICATES = [("percentage", 45, 90), ("result", "PASS", "COMP"), ("subject", "041", 60)]
+
+
+def measure(fn, repeats, memory):
+    """Median wall and CPU seconds of ``fn()`` over ``repeats`` runs, plus its peak traced allocation."""
+    walls, cpus = [], []
+    for _ in range(repeats):
+        gc.collect()
+        wall, cpu = time.perf_counter(), time.process_time()
+        fn()
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+
+    result = {"wall_s": round(statistics.median(walls), 6), "cpu_s": round(statistics.median(cpus), 6)}
+    if memory:
+        # A separate run, since tracing slows the code it measures
+        gc.collect()
+        tracemalloc.start()
+        # Stages inside fn() reset tracemalloc's peak; one around it folds theirs into its own
+        with stage("bench") as measured:
+            fn()
+        tracemalloc.stop()
+        result["peak_mb"] = measured["peak_mb"]
+    return result
+
+
+def frame_memory(df):
+    # The frame's memory against the same table with a Python object per cell, as pd.DataFrame(records) gives
+    plain = df.astype(object).assign(**{"Roll No": df["Roll No"].astype(str)})
+    return {"frame_mb": round(df.memory_usage(deep=True).sum() / (1 << 20), 3),
+            "object_frame_mb": round(plain.memory_usage(deep=True).sum() / (1 << 20), 3)}
+
+
+def aggregate(df):
+    df["Result"].value_counts()
+    pd.cut(df["Percentage"], bins=TIER_BINS, right=False).value_counts()
+    SubjectIndex(df).averages()
+
+
+def summary_tables(cube, within=None):
+    cube.summary(within)
+    cube.result_counts(within)
+    cube.tier_counts(within)
+    cube.subject_averages(within)
+
+
+def run_size(size, args):
+    data = gazette_text(size, args.seed).encode()
+    cases = []
+
+    def case(name, fn, rows, **extra):
+        result = measure(fn, args.repeats, not args.no_memory)
+        cases.append({"case": name, "candidates": size, "rows": rows, **result, **extra})
+        print(f"{name:<24} {size:>9} {result['wall_s']:>10.4f}s", file=sys.stderr)
+
+    frames = {}
+    for parser in sorted(PARSERS):
+        frames[parser] = parse_gazette_file(io.BytesIO(data), parser, workers=1)
+        case(f"parse/{parser}", lambda: parse_gazette_file(io.BytesIO(data), parser, workers=1), len(frames[parser]),
+             input_bytes=len(data), **frame_memory(frames[parser]))
+        # Straight from the upload buffer, as first uploads are parsed, then with the block table reissues need
+        case(f"parse/{parser}/buffer", lambda: parse_gazette_buffer(data, parser, workers=1, blocks=False),
+             len(frames[parser]), input_bytes=len(data))
+        case(f"parse/{parser}/blocks", lambda: parse_gazette_buffer(data, parser, workers=1), len(frames[parser]),
+             input_bytes=len(data))
+        # Record extraction alone, from decoded lines and, where there is one, straight from the bytes
+        text = data.decode()
+        case(f"records/{parser}", lambda: list(PARSERS[parser](iter_lines(text))), len(frames[parser]))
+        if parser in BYTE_PARSERS:
+            case(f"records/{parser}/bytes", lambda: BYTE_PARSERS[parser](data), len(frames[parser]))
+        if args.workers > 1:
+            case(f"parse/{parser}/parallel", lambda: parse_gazette_file(io.BytesIO(data), parser, workers=args.workers),
+                 len(frames[parser]), input_bytes=len(data), workers=args.workers)
+
+    df = frames["regex"]
+    case("aggregate", lambda: aggregate(df), len(df))
+    subjects = SubjectIndex(df)
+    case("aggregate/cube", lambda: AggregateCube(df, subjects), len(df))
+    cube = AggregateCube(df, subjects)
+    within = df.iloc[::10]
+    case("aggregate/tables", lambda: summary_tables(cube), len(df))
+    case("aggregate/tables/within", lambda: summary_tables(cube, within), len(within))
+    case("index/subjects", lambda: SubjectIndex(df), len(df))
+    case("index/search", lambda: SearchIndex(df), len(df))
+
+    # Every predicate evaluated, then only the changed one while the others come from the cache
+    case("filter/cold", lambda: FilterEngine(df, subjects).mask(*FILTER_PREDICATES), len(df))
+    filters = FilterEngine(df, subjects)
+    filters.mask(*FILTER_PREDICATES)
+    thresholds = itertools.count(61)
+    case("filter/one_changed", lambda: filters.mask(*FILTER_PREDICATES[:-1], ("subject", "041", next(thresholds))),
+         len(df))
+
+    # Ranks from the sorted subject index, then a subject's top-N list as a slice of it
+    case("rank/build", lambda: Rankings(df, subjects), len(df))
+    ranks = Rankings(df, subjects)
+    case("rank/subject_top100", lambda: ranks.students("041", top=100), len(ranks.students("041", top=100)))
+
+    search = SearchIndex(df)
+    for query in SEARCH_QUERIES:
+        case(f"search/{query}", lambda: search.search(query), len(search.search(query)))
+
+    for fmt in EXPORT_FORMATS:
+        case(f"export/{fmt.lower()}", lambda: export_bytes(df, fmt), len(df), output_bytes=len(export_bytes(df, fmt)))
+    return cases
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline_path):
+    """Wall time of each case against the same case in an earlier report."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(c["case"], c["candidates"]): c for c in json.load(f)["results"]}
+    print(f"{'case':<24} {'candidates':>10} {'before':>10} {'after':>10} {'ratio':>7}")
+    for c in report["results"]:
+        before = baseline.get((c["case"], c["candidates"]))
+        if before and before["wall_s"]:
+            print(f"{c['case']:<24} {c['candidates']:>10} {before['wall_s']:>10.4f} {c['wall_s']:>10.4f} "
+                  f"{c['wall_s'] / before['wall_s']:>7.2f}")
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark parsing, aggregation, search and export.")
+    arg_parser.add_argument("-s", "--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                            help="candidates per synthetic gazette (default: 1000 10000 100000)")
+    arg_parser.add_argument("-r", "--repeats", type=int, default=3, help="timed runs per case; the median is kept")
+    arg_parser.add_argument("-j", "--workers", type=int, default=1, help="also time parallel parsing with this many workers")
+    arg_parser.add_argument("--seed", type=int, default=1)
+    arg_parser.add_argument("--no-memory", action="store_true", help="skip the traced run that measures peak memory")
+    arg_parser.add_argument("-o", "--output", help="write the JSON report here (default: standard output)")
+    arg_parser.add_argument("--compare", metavar="REPORT", help="print wall time ratios against an earlier report")
+    args = arg_parser.parse_args(argv)
+
+    report = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "repeats": args.repeats,
+        "results": [result for size in args.sizes for result in run_size(size, args)],
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# On-disk cache of parsed gazettes, shared by every app process and surviving restarts
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+
+from cbse_metrics import stage
+
+CACHE_DIR = os.environ.get("CBSE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "cbse"))
+
+# Total size of cached results before the least recently used ones are evicted
+CACHE_MAX_BYTES = int(os.environ.get("CBSE_CACHE_MAX_BYTES", 512 << 20))
+
+# Bump whenever parser output changes, so results cached by an older version are not reused
+CACHE_VERSION = 1
+
+# Bytes fed to the hash per update
+HASH_CHUNK = 1 << 20
+
+# Digests of recent uploads by Streamlit file_id, so reruns don't rehash the same bytes
+_upload_digests = OrderedDict()
+_UPLOAD_DIGESTS_MAX = 256
+
+
+def content_digest(data):
+    """Streaming blake2b digest of raw gazette bytes, hashed through a memoryview without copying."""
+    h = hashlib.blake2b(digest_size=20)
+    view = memoryview(data)
+    with stage("hash", bytes=len(view)):
+        for start in range(0, len(view), HASH_CHUNK):
+            h.update(view[start:start + HASH_CHUNK])
+    return h.hexdigest()
+
+
+def upload_digest(uploaded_file):
+    """content_digest() of an uploaded file, remembered for as long as the upload is around."""
+    file_id = getattr(uploaded_file, "file_id", None)
+    if file_id is not None and file_id in _upload_digests:
+        _upload_digests.move_to_end(file_id)
+        return _upload_digests[file_id]
+
+    digest = content_digest(uploaded_file.getbuffer())
+    if file_id is not None:
+        _upload_digests[file_id] = digest
+        if len(_upload_digests) > _UPLOAD_DIGESTS_MAX:
+            _upload_digests.popitem(last=False)
+    return digest
+
+
+class ParseCache:
+    """Parsed frames stored as Parquet files, one per (gazette content, parser).
+
+    Writes go through a temporary file and an atomic rename, so several
+    processes can share one directory. Reads refresh a file's mtime and give
+    the frame in the schema a fresh parse does (see compact_frame()), and the
+    oldest files are removed once the directory grows past ``max_bytes``.
+    Next to each frame go its record block table and, per gazette file name
+    and school, a pointer to its latest revision, for incremental re-parsing
+    of reissues. Block tables and pointers count toward ``max_bytes`` too.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, data, parser):
+        return f"{content_digest(data)}-{parser}-v{CACHE_VERSION}"
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.parquet")
+
+    def blocks_path(self, key):
+        return os.path.join(self.directory, f"{key}.blocks.npy")
+
+    def latest_path(self, name, school, parser):
+        # Two schools' "result.txt" are different gazettes, so the school from the header is part of the pointer
+        name_digest = hashlib.blake2b(f"{name}\n{school}".encode(), digest_size=10).hexdigest()
+        return os.path.join(self.directory, f"{name_digest}-{parser}-v{CACHE_VERSION}.latest")
+
+    def get(self, key):
+        # pandas (and pyarrow with it) is only needed once there is something to read
+        import pandas as pd
+
+        from cbse_parser import compact_frame
+
+        path = self.path(key)
+        with stage("cache_read"):
+            try:
+                df = pd.read_parquet(path)
+                os.utime(path)
+            except (OSError, ValueError):
+                # Missing, evicted by another process, or half-written by an older version
+                return None
+            # Every read in the schema a fresh parse gives, whatever wrote the file
+            return compact_frame(df)
+
+    def get_blocks(self, key):
+        """Block digests and students per block of a cached frame, or None if it was cached without them."""
+        import numpy as np
+
+        try:
+            table = np.load(self.blocks_path(key))
+        except (OSError, ValueError):
+            return None
+        return table[0], table[1].astype(np.uint32)
+
+    def previous(self, name, school, parser):
+        """Frame and block table of the latest cached revision of the gazette file ``name`` of ``school``, or None.
+
+        The block table is None if that revision was cached without one.
+        """
+        path = self.latest_path(name, school, parser)
+        try:
+            with open(path, encoding="utf-8") as f:
+                key = f.read().strip()
+            os.utime(path)
+        except OSError:
+            return None
+        df = self.get(key)
+        if df is None:
+            return None
+        return df, self.get_blocks(key)
+
+    def write(self, path, write):
+        # Readers in other processes only ever see a complete file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                write(tmp_file)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def put(self, key, df, blocks=None):
+        try:
+            with stage("cache_write", rows=len(df)):
+                if blocks is not None:
+                    import numpy as np
+
+                    table = np.stack([np.asarray(column, dtype=np.uint64) for column in blocks])
+                    self.write(self.blocks_path(key), lambda f: np.save(f, table))
+                self.write(self.path(key), lambda f: df.to_parquet(f, index=False))
+        except Exception as e:
+            print(f"Could not cache parsed gazette: {e}")
+            return
+        self.evict()
+
+    def set_latest(self, name, school, parser, key):
+        """Record ``key`` as the latest revision of the gazette file ``name`` of ``school``."""
+        try:
+            self.write(self.latest_path(name, school, parser), lambda f: f.write(key.encode()))
+        except OSError as e:
+            print(f"Could not cache parsed gazette: {e}")
+
+    def evict(self):
+        # Frames (with their block tables) and revision pointers, least recently used first, until the directory fits
+        files = {}
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith((".parquet", ".blocks.npy", ".latest")):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files[entry.path] = stat.st_mtime, stat.st_size
+
+        entries = []
+        for path, (mtime, size) in files.items():
+            group = [path]
+            if path.endswith(".parquet"):
+                group.append(path[:-len(".parquet")] + ".blocks.npy")
+            elif path.endswith(".blocks.npy") and path[:-len(".blocks.npy")] + ".parquet" in files:
+                # Goes with its frame
+                continue
+            entries.append((mtime, sum(files[p][1] for p in group if p in files), group))
+
+        total = sum(size for _, size in files.values())
+        kept = []
+        for _, size, group in sorted(entries):
+            if total <= self.max_bytes:
+                kept.extend(group)
+                continue
+            for stale in group:
+                try:
+                    os.unlink(stale)
+                except OSError:
+                    pass
+            total -= size
+
+        # Pointers to revisions no longer cached lead nowhere
+        for path in kept:
+            if path.endswith(".latest"):
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        key = f.read().strip()
+                    if not os.path.exists(self.path(key)):
+                        os.unlink(path)
+                except OSError:
+                    pass
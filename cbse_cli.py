@@ -0,0 +1,96 @@
+# Command-line batch parsing of CBSE gazettes, for scheduled jobs; never imports Streamlit
+import argparse
+import json
+import os
+import sys
+import time
+
+from cbse_cache import CACHE_DIR, ParseCache
+from cbse_export import EXPORT_FORMATS
+from cbse_index import CODE_COLUMNS
+from cbse_metrics import stage, start_run
+from cbse_parser import PARSERS, expand_paths, parse_paths, roll_text
+
+# Output formats by file extension, e.g. "xlsx" -> "Excel"
+FORMATS_BY_EXTENSION = {extension: name for name, (extension, _, _) in EXPORT_FORMATS.items()}
+
+
+def summarise(df, dropped, paths, parser, seconds):
+    """Counts describing one batch run, written next to the outputs as JSON."""
+    summary = {
+        "files": paths,
+        "parser": parser,
+        "students": len(df),
+        "duplicates_dropped": dropped,
+        "parse_seconds": round(seconds, 3),
+    }
+    if len(df):
+        summary["results"] = {str(result): int(count) for result, count in df["Result"].value_counts().items() if count}
+        summary["average_percentage"] = round(float(df["Percentage"].mean()), 2)
+        summary["subjects"] = len(set().union(*(df[column].dropna().unique() for column in CODE_COLUMNS)))
+    return summary
+
+
+def write_outputs(df, out_dir, stem, extensions):
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for extension in extensions:
+        path = os.path.join(out_dir, f"{stem}.{extension}")
+        with stage(f"export_{extension}", rows=len(df)), open(path, "wb") as f:
+            EXPORT_FORMATS[FORMATS_BY_EXTENSION[extension]][2](df, f)
+        written.append(path)
+    return written
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description="Parse CBSE gazette TXT files and write the cleaned results without starting the web app."
+    )
+    arg_parser.add_argument("gazettes", nargs="+", help="gazette files or glob patterns (quote patterns like '**/*.txt')")
+    arg_parser.add_argument("-o", "--out-dir", default=".", help="directory for the outputs (default: current directory)")
+    arg_parser.add_argument("-n", "--name", default="cbse_cleaned_result", help="file name stem of the outputs")
+    arg_parser.add_argument("-f", "--format", dest="formats", nargs="+", choices=sorted(FORMATS_BY_EXTENSION),
+                            default=["parquet"], help="output formats (default: parquet)")
+    arg_parser.add_argument("--parser", choices=sorted(PARSERS), default="regex",
+                            help="'regex' for the standard apps, 'scan' for the tfri line scanner")
+    arg_parser.add_argument("-j", "--workers", type=int, default=None,
+                            help="worker processes (default: CBSE_PARSE_WORKERS or the CPU count)")
+    arg_parser.add_argument("--cache-dir", default=CACHE_DIR, help="parse cache directory")
+    arg_parser.add_argument("--no-cache", action="store_true", help="parse every file even if it was parsed before")
+    args = arg_parser.parse_args(argv)
+
+    paths = expand_paths(args.gazettes)
+    missing = [path for path in paths if not os.path.isfile(path)]
+    if not paths or missing:
+        arg_parser.error(f"no such gazette: {', '.join(missing) or ' '.join(args.gazettes)}")
+
+    run = start_run("cbse_cli")
+    cache = None if args.no_cache else ParseCache(args.cache_dir)
+    revisions = {}
+    started = time.perf_counter()
+    df, dropped = parse_paths(paths, args.parser, args.workers, cache, revisions)
+    seconds = time.perf_counter() - started
+
+    written = write_outputs(df, args.out_dir, args.name, dict.fromkeys(args.formats))
+    summary = summarise(df, dropped, paths, args.parser, seconds)
+    summary["outputs"] = written
+    # Gazettes re-parsed incrementally as reissues of ones cached earlier
+    summary["revisions"] = {
+        name: {kind: roll_text(changes["Roll No"]).tolist() for kind, changes in diff.items()}
+        for name, diff in revisions.items()
+    }
+    summary["stages"] = run.finish().stages
+    summary_path = os.path.join(args.out_dir, f"{args.name}_summary.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"Parsed {len(df)} students from {len(paths)} gazette(s) in {seconds:.2f}s")
+    for name, diff in revisions.items():
+        print(f"  {name} revised: " + ", ".join(f"{len(changes)} {kind}" for kind, changes in diff.items()))
+    for path in written + [summary_path]:
+        print(f"  wrote {path}")
+    return 0 if len(df) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
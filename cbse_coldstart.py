@@ -0,0 +1,96 @@
+# Cold-start budget check: how long each app takes to import what it needs before and after the upload screen
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APPS = ["adv_cbse_1.py", "adv_cbse_2.py", "adv_cbse_3.py", "adv_cbse_4.py", "adv_cbse_5.py", "tfri.py"]
+
+# Seconds allowed for the imports before st.file_uploader (the first paint), and for all imports
+FIRST_PAINT_BUDGET = float(os.environ.get("CBSE_FIRST_PAINT_BUDGET", 0.6))
+TOTAL_IMPORT_BUDGET = float(os.environ.get("CBSE_TOTAL_IMPORT_BUDGET", 2.0))
+
+# Modules that must never be loaded by a plain import of the core modules
+CORE_MODULES = ["cbse_cache", "cbse_parser", "cbse_export", "cbse_index", "cbse_store", "cbse_jobs", "cbse_cli"]
+LAZY_MODULES = ["streamlit"]
+
+# Run in a fresh interpreter: import the given statements in two phases and time each
+PROBE = """
+import json, sys, time
+phases = json.loads(sys.argv[1])
+timings = []
+for statements in phases:
+    started = time.perf_counter()
+    exec("\\n".join(statements), {})
+    timings.append(time.perf_counter() - started)
+print(json.dumps({"timings": timings, "modules": sorted(sys.modules)}))
+"""
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_phases(path):
+    """Module-level import statements of an app, split at its st.file_uploader call."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    phases = [[], []]
+    phase = 0
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            phases[phase].append(ast.unparse(node))
+        elif any(isinstance(call, ast.Attribute) and call.attr == "file_uploader" for call in ast.walk(node)):
+            phase = 1
+    return phases
+
+
+def probe(phases):
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, json.dumps(phases)],
+        cwd=HERE, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output)
+
+
+def measure_app(app, repeats):
+    phases = import_phases(os.path.join(HERE, app))
+    runs = [probe(phases)["timings"] for _ in range(repeats)]
+    first_paint = statistics.median(run[0] for run in runs)
+    total = statistics.median(run[0] + run[1] for run in runs)
+    return {
+        "app": app,
+        "first_paint_imports": phases[0],
+        "first_paint_seconds": round(first_paint, 4),
+        "total_import_seconds": round(total, 4),
+        "within_budget": first_paint <= FIRST_PAINT_BUDGET and total <= TOTAL_IMPORT_BUDGET,
+    }
+
+
+def check_core():
+    """Lazy modules pulled in by importing the core modules on their own."""
+    modules = probe([[f"import {module}" for module in CORE_MODULES], []])["modules"]
+    return [module for module in LAZY_MODULES if module in modules]
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Measure app cold-start imports against the budget.")
+    arg_parser.add_argument("apps", nargs="*", default=APPS, help="apps to measure (default: all)")
+    arg_parser.add_argument("-r", "--repeats", type=int, default=3, help="fresh interpreters per app; the median is kept")
+    args = arg_parser.parse_args(argv)
+
+    results = [measure_app(app, args.repeats) for app in args.apps]
+    leaked = check_core()
+    report = {
+        "first_paint_budget": FIRST_PAINT_BUDGET,
+        "total_import_budget": TOTAL_IMPORT_BUDGET,
+        "apps": results,
+        "core_imports_lazy_modules": leaked,
+    }
+    print(json.dumps(report, indent=2))
+    return 0 if all(result["within_budget"] for result in results) and not leaked else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+# Spreadsheet and data exports, built only when a download is actually requested
+import io
+import threading
+import zipfile
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from cbse_metrics import stage
+from cbse_parser import roll_text
+
+XLSX_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Rows converted and written per step, so no format ever materialises the whole table at once
+ROW_CHUNK = 50_000
+
+# Deflate level for XLSX sheets; the fastest level, since the XML is very repetitive anyway
+XLSX_COMPRESSION = 1
+
+# Finished exports kept for repeat downloads, across sessions
+EXPORT_CACHE_BYTES = 256 << 20
+
+_exports = OrderedDict()
+_exports_size = 0
+_exports_lock = threading.Lock()
+
+
+def iter_chunks(df, rows=ROW_CHUNK):
+    for start in range(0, len(df), rows):
+        yield df.iloc[start:start + rows]
+
+
+def text_rolls(df):
+    # Spreadsheets get roll numbers as zero-padded text, as they were before Roll No became numeric
+    if "Roll No" in df.columns and pd.api.types.is_integer_dtype(df["Roll No"]):
+        return df.assign(**{"Roll No": roll_text(df["Roll No"])})
+    return df
+
+
+# The parts of a one-sheet workbook besides the sheet itself; style 1 is the bold header
+XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+SHEET_END = '</sheetData></worksheet>'
+
+# Characters XML 1.0 does not allow at all, and those that must be escaped in text
+XML_INVALID = r"[\x00-\x08\x0b\x0c\x0e-\x1f]"
+XML_ESCAPES = [("&", "&amp;"), ("<", "&lt;"), (">", "&gt;")]
+
+
+def xml_text(values):
+    """Strings as XML text content."""
+    values = values.astype(str).str.replace(XML_INVALID, "", regex=True)
+    for char, escape in XML_ESCAPES:
+        values = values.str.replace(char, escape, regex=False)
+    return values
+
+
+def column_letter(index):
+    letters = ""
+    index += 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(ord("A") + rest) + letters
+    return letters
+
+
+def sheet_cells(column, letter, rows):
+    """XML of one column's cells, given the row numbers as strings; missing values get no cell."""
+    refs = f'<c r="{letter}' + rows
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # Escape the few categories, then pick them by code
+        codes = column.cat.codes.to_numpy()
+        text = xml_text(pd.Series(column.cat.categories)).to_numpy(dtype=object)[codes]
+        cells = refs + '" t="inlineStr"><is><t>' + text + '</t></is></c>'
+        missing = codes < 0
+    elif pd.api.types.is_bool_dtype(column):
+        cells = refs + '" t="b"><v>' + np.where(column.fillna(False).to_numpy(dtype=bool), "1", "0").astype(object) + '</v></c>'
+        missing = column.isna().to_numpy()
+    elif pd.api.types.is_numeric_dtype(column):
+        cells = refs + '"><v>' + column.astype(str).to_numpy(dtype=object, na_value="") + '</v></c>'
+        missing = column.isna().to_numpy()
+    else:
+        cells = refs + '" t="inlineStr"><is><t>' + xml_text(column).to_numpy(dtype=object, na_value="") + '</t></is></c>'
+        missing = column.isna().to_numpy()
+    cells[missing] = ""
+    return cells
+
+
+def write_xlsx(df, stream):
+    """One-sheet workbook whose sheet XML is built a chunk of rows at a time, column by column.
+
+    Cells are formatted with vectorised string operations rather than one
+    Python call per cell, and the sheet is compressed into the zip as it is
+    written, so large tables export in seconds with flat memory.
+    """
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED, compresslevel=XLSX_COMPRESSION) as workbook:
+        for name, xml in XLSX_PARTS.items():
+            workbook.writestr(name, xml)
+        letters = [column_letter(i) for i in range(len(df.columns))]
+        with workbook.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(SHEET_START.encode())
+            header = xml_text(pd.Series([str(name) for name in df.columns], dtype=object)).tolist()
+            sheet.write(('<row r="1">' + "".join(
+                f'<c r="{letter}1" s="1" t="inlineStr"><is><t>{name}</t></is></c>'
+                for letter, name in zip(letters, header)
+            ) + '</row>').encode())
+            for start, chunk in zip(range(0, len(df), ROW_CHUNK), iter_chunks(df)):
+                chunk = text_rolls(chunk)
+                rows = np.arange(start + 2, start + 2 + len(chunk)).astype(str).astype(object)
+                xml = '<row r="' + rows + '">'
+                for letter, (_, column) in zip(letters, chunk.items()):
+                    xml = xml + sheet_cells(column, letter, rows)
+                sheet.write("".join((xml + '</row>').tolist()).encode())
+            sheet.write(SHEET_END.encode())
+
+
+def write_csv(df, stream):
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    for start, chunk in enumerate(iter_chunks(df)):
+        text_rolls(chunk).to_csv(text, header=start == 0, index=False)
+    if df.empty:
+        df.to_csv(text, index=False)
+    text.flush()
+    text.detach()
+
+
+def write_parquet(df, stream):
+    """One Parquet row group per chunk, keeping the typed columns as they are."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    for chunk in iter_chunks(df):
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(stream, table.schema)
+        writer.write_table(table.cast(writer.schema))
+    if writer is None:
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), stream)
+    else:
+        writer.close()
+
+
+# Format name -> (file extension, MIME type, writer)
+EXPORT_FORMATS = {
+    "Excel": ("xlsx", XLSX_MIME, write_xlsx),
+    "CSV": ("csv", "text/csv", write_csv),
+    "Parquet": ("parquet", "application/vnd.apache.parquet", write_parquet),
+}
+
+
+def export_bytes(df, fmt="Excel"):
+    extension, _, write = EXPORT_FORMATS[fmt]
+    buffer = io.BytesIO()
+    with stage(f"export_{extension}", rows=len(df)):
+        write(df, buffer)
+    return buffer.getvalue()
+
+
+def _remember(key, data):
+    global _exports_size
+    with _exports_lock:
+        if key in _exports:
+            return
+        _exports[key] = data
+        _exports_size += len(data)
+        while _exports_size > EXPORT_CACHE_BYTES and len(_exports) > 1:
+            _, evicted = _exports.popitem(last=False)
+            _exports_size -= len(evicted)
+
+
+def _recall(key):
+    with _exports_lock:
+        data = _exports.get(key)
+        if data is not None:
+            _exports.move_to_end(key)
+        return data
+
+
+def lazy_export(df, dataset_key, view, fmt="Excel"):
+    """Deferred ``data`` for st.download_button: the file is built on the first click only.
+
+    ``dataset_key`` identifies the parsed gazettes and ``view`` the filter that
+    produced ``df``; downloading the same view of the same data in the same
+    format again reuses the finished file.
+    """
+    key = (dataset_key, view, fmt)
+
+    def build():
+        data = _recall(key)
+        if data is None:
+            data = export_bytes(df, fmt)
+            _remember(key, data)
+        return data
+
+    return build
@@ -0,0 +1,501 @@
+# Lookup structures built once per parsed dataset, so views don't rescan the wide table on every rerun
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from cbse_parser import ROLL_WIDTH, SUBJECT_SLOTS
+
+CODE_COLUMNS = [f"Sub{slot + 1} Code" for slot in range(SUBJECT_SLOTS)]
+MARK_COLUMNS = [f"Sub{slot + 1} Marks" for slot in range(SUBJECT_SLOTS)]
+
+# Predicate masks kept per FilterEngine, most recently used first to stay
+FILTER_MASKS = 64
+
+# Length of the substrings indexed for name and roll number search
+NGRAM = 3
+
+# Searches of the form "12000100-12000250" select a range of roll numbers
+ROLL_RANGE = re.compile(r"(\d{1,8})\s*-\s*(\d{1,8})")
+
+# Share of a query's n-grams a name must contain to count as a close match
+FUZZY_MIN_SHARE = 0.3
+
+# Performance tiers as [low, high) Percentage bins; 100% and missing percentages fall in no tier, as with pd.cut
+TIER_BINS = [0, 33, 45, 60, 75, 100]
+TIER_LABELS = ['Fail (<33%)', 'Pass (33-44%)', 'Second (45-59%)', 'First (60-74%)', 'Distinction (75%+)']
+
+
+def subject_dtype(df):
+    # The parser gives every Sub Code column the same categories; frames from elsewhere may not
+    dtypes = {df[column].dtype for column in CODE_COLUMNS}
+    if len(dtypes) == 1:
+        dtype = dtypes.pop()
+        if isinstance(dtype, pd.CategoricalDtype):
+            return dtype
+    values = set()
+    for column in CODE_COLUMNS:
+        values.update(df[column].dropna().unique())
+    return pd.CategoricalDtype(sorted(values))
+
+
+class SubjectIndex:
+    """Long (Roll No, Subject Code, Marks) table of every subject sat, grouped by subject code.
+
+    Entries are sorted by subject, then by marks from highest to lowest, so
+    one subject's students are a contiguous slice between two offsets. Views
+    restricted to part of the dataset (e.g. search results) pass that part as
+    ``within``; it must be a row subset of the frame the index was built from.
+    """
+
+    def __init__(self, df):
+        self.frame = df
+        self.dtype = subject_dtype(df)
+
+        codes = np.concatenate([pd.Categorical(df[column], dtype=self.dtype).codes for column in CODE_COLUMNS])
+        marks = np.concatenate([df[column].to_numpy() for column in MARK_COLUMNS])
+        rows = np.tile(np.arange(len(df)), SUBJECT_SLOTS)
+        slots = np.repeat(np.arange(SUBJECT_SLOTS, dtype=np.int8), len(df))
+
+        sat = codes >= 0
+        codes, marks, rows, slots = codes[sat], marks[sat], rows[sat], slots[sat]
+        order = np.lexsort((rows, -marks.astype(np.int32), codes))
+        self.codes = codes[order]
+        self.marks = marks[order]
+        self.rows = rows[order]
+        self.slots = slots[order]
+
+        counts = np.bincount(self.codes, minlength=len(self.dtype.categories))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        # Each entry's (slot, subject) pair, which subject averages are taken over
+        self.slot_codes = self.slots.astype(np.int64) * len(self.dtype.categories) + self.codes
+        self._averages = self.average_table(*self.slot_tally(self.slot_codes, self.marks))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def covers(self, within):
+        # A row subset as long as the whole frame is the whole frame
+        return within is None or len(within) == len(self.frame)
+
+    def row_mask(self, within):
+        mask = np.zeros(len(self.frame), dtype=bool)
+        mask[self.frame.index.get_indexer(within.index)] = True
+        return mask
+
+    def span(self, code):
+        try:
+            position = self.dtype.categories.get_loc(code)
+        except KeyError:
+            return slice(0, 0)
+        return slice(self.offsets[position], self.offsets[position + 1])
+
+    def subjects(self, within=None):
+        """Subject codes sat by at least one student (in ``within``, if given), sorted."""
+        if self.covers(within):
+            counts = np.diff(self.offsets)
+        else:
+            taken = self.row_mask(within)[self.rows]
+            counts = np.bincount(self.codes[taken], minlength=len(self.dtype.categories))
+        return list(self.dtype.categories[counts > 0])
+
+    def entries(self, code, within=None, top=None):
+        """Positions of the entries for ``code`` (in ``within``, if given), highest marks first; at most ``top``."""
+        span = self.span(code)
+        if self.covers(within):
+            return np.arange(span.start, span.stop)[:top]
+        taken = np.flatnonzero(self.row_mask(within)[self.rows[span]])
+        return span.start + taken[:top]
+
+    def students(self, code, within=None, top=None):
+        """Roll No, Name, Subject Code and Marks of the students who sat ``code``, highest marks first."""
+        return self.students_at(code, self.entries(code, within, top))
+
+    def students_at(self, code, entries):
+        rows, marks = self.rows[entries], self.marks[entries]
+        students = self.frame.iloc[rows][["Roll No", "Name"]]
+        return students.assign(**{
+            "Subject Code": pd.Categorical([code] * len(rows), dtype=self.dtype),
+            "Marks": marks,
+        })
+
+    def averages(self, within=None):
+        """Subject Code and Average Marks, best subject first; see average_table()."""
+        if self.covers(within):
+            return self._averages
+        taken = self.row_mask(within)[self.rows]
+        return self.average_table(*self.slot_tally(self.slot_codes[taken], self.marks[taken]))
+
+    def slot_tally(self, slot_codes, marks):
+        # Papers and marks total per (slot, subject)
+        size = SUBJECT_SLOTS * len(self.dtype.categories)
+        shape = (SUBJECT_SLOTS, len(self.dtype.categories))
+        return (np.bincount(slot_codes, minlength=size).reshape(shape),
+                np.bincount(slot_codes, weights=marks, minlength=size).reshape(shape))
+
+    def average_table(self, counts, totals):
+        """Subject Code and Average Marks from papers and marks totals per (slot, subject), best subject first.
+
+        A subject's average is the mean of its average in each of the Sub1..Sub5
+        slots it appears in, as the apps have always computed it, not the mean
+        over all its papers.
+        """
+        in_slot = counts > 0
+        slot_averages = np.divide(totals, counts, out=np.zeros(totals.shape), where=in_slot)
+        slots = in_slot.sum(axis=0)
+        sat = slots > 0
+        table = pd.DataFrame({
+            "Subject Code": self.dtype.categories[sat],
+            "Average Marks": slot_averages.sum(axis=0)[sat] / slots[sat],
+        })
+        return table.sort_values(by="Average Marks", ascending=False, ignore_index=True)
+
+
+def tier_codes(percentages):
+    """Position of each percentage's tier in TIER_LABELS, or -1 for none: pd.cut(..., right=False) as codes."""
+    codes = np.searchsorted(TIER_BINS, percentages, side="right") - 1
+    codes[(codes >= len(TIER_LABELS)) | np.isnan(percentages)] = -1
+    return codes
+
+
+class AggregateCube:
+    """Students, Percentage and marks totals of a parsed dataset by result, performance tier and subject.
+
+    Every row falls in one (result, tier) cell, with an extra slot on each
+    axis for rows with no result or no tier. The cube holds each cell's
+    students and Percentage total, and each (cell, slot, subject)'s papers and
+    marks total, so the summary tables only add up a few thousand numbers.
+    Views restricted to part of the dataset pass it as ``within``; only that
+    part's precomputed cell numbers are binned again, no column is rescanned.
+    """
+
+    def __init__(self, df, subjects):
+        self.frame = df
+        self.subjects = subjects
+
+        results = pd.Categorical(df["Result"])
+        self.result_dtype = results.dtype
+        self.tier_codes = tier_codes(df["Percentage"].to_numpy(dtype=np.float64))
+        result_slots = np.where(results.codes < 0, len(results.categories), results.codes)
+        tier_slots = np.where(self.tier_codes < 0, len(TIER_LABELS), self.tier_codes)
+        self.shape = (len(results.categories) + 1, len(TIER_LABELS) + 1)
+        self.cells = result_slots * self.shape[1] + tier_slots
+
+        self.percentages = df["Percentage"].to_numpy(dtype=np.float64)
+        # Each paper in the subject index, by (cell, slot, subject)
+        self.papers = self.cells[subjects.rows] * SUBJECT_SLOTS * len(subjects.dtype.categories) + subjects.slot_codes
+        self.totals = self.tally(None)
+
+    def covers(self, within):
+        return within is None or len(within) == len(self.frame)
+
+    def tally(self, mask):
+        # Students, scored students, Percentage total, papers and marks total per cell, over the rows in ``mask``
+        cells, percentages, papers, marks = self.cells, self.percentages, self.papers, self.subjects.marks
+        if mask is not None:
+            cells, percentages = cells[mask], percentages[mask]
+            taken = mask[self.subjects.rows]
+            papers, marks = papers[taken], marks[taken]
+        size = self.shape[0] * self.shape[1]
+        subjects = len(self.subjects.dtype.categories)
+        scored = ~np.isnan(percentages)
+        return {
+            "students": np.bincount(cells, minlength=size).reshape(self.shape),
+            "scored": np.bincount(cells[scored], minlength=size).reshape(self.shape),
+            "percentage": np.bincount(cells[scored], weights=percentages[scored], minlength=size).reshape(self.shape),
+            "papers": np.bincount(papers, minlength=size * SUBJECT_SLOTS * subjects).reshape(*self.shape, SUBJECT_SLOTS, subjects),
+            "marks": np.bincount(papers, weights=marks, minlength=size * SUBJECT_SLOTS * subjects).reshape(
+                *self.shape, SUBJECT_SLOTS, subjects),
+        }
+
+    def cube(self, within=None):
+        if self.covers(within):
+            return self.totals
+        return self.tally(self.subjects.row_mask(within))
+
+    def summary(self, within=None):
+        """Students, average Percentage and students per result, for the school summary card."""
+        cube = self.cube(within)
+        scored = cube["scored"].sum()
+        results = cube["students"][:-1].sum(axis=1)
+        return {
+            "students": int(cube["students"].sum()),
+            "average_percentage": cube["percentage"].sum() / scored if scored else float("nan"),
+            "results": dict(zip(self.result_dtype.categories, results.tolist())),
+        }
+
+    def result_counts(self, within=None):
+        """Result and Count of every result, most common first, like Result.value_counts()."""
+        counts = self.cube(within)["students"][:-1].sum(axis=1)
+        order = np.argsort(-counts, kind="stable")
+        return pd.DataFrame({
+            "Result": pd.Categorical(self.result_dtype.categories[order], dtype=self.result_dtype),
+            "Count": counts[order],
+        })
+
+    def tier_counts(self, within=None):
+        """Tier and Count of every performance tier, lowest tier first."""
+        counts = self.cube(within)["students"][:, :-1].sum(axis=0)
+        return pd.DataFrame({
+            "Tier": pd.Categorical(TIER_LABELS, categories=TIER_LABELS, ordered=True),
+            "Count": counts,
+        })
+
+    def subject_averages(self, within=None):
+        """Subject Code and Average Marks, best subject first; see SubjectIndex.average_table()."""
+        cube = self.cube(within)
+        return self.subjects.average_table(cube["papers"].sum(axis=(0, 1)), cube["marks"].sum(axis=(0, 1)))
+
+    def tiers(self, within):
+        """Performance Tier of each row of ``within``, a row subset of the frame the cube was built from."""
+        rows = self.frame.index.get_indexer(within.index)
+        tiers = pd.Categorical.from_codes(self.tier_codes[rows], categories=TIER_LABELS, ordered=True)
+        return pd.Series(tiers, index=within.index, name="Performance Tier")
+
+
+def tied_ranks(values, starts):
+    # Competition ranks of ``values``, sorted highest first in groups that begin at ``starts``
+    positions = np.arange(len(values))
+    new_group = np.zeros(len(values), dtype=bool)
+    new_group[starts[starts < len(values)]] = True
+    new_value = new_group.copy()
+    new_value[1:] |= values[1:] != values[:-1]
+    if len(values):
+        new_value[0] = True
+    group_start = np.maximum.accumulate(np.where(new_group, positions, 0))
+    value_start = np.maximum.accumulate(np.where(new_value, positions, 0))
+    return value_start - group_start + 1
+
+
+class Rankings:
+    """Rank and percentile of every student in each subject they sat.
+
+    The subject index's entries are already sorted by marks within each
+    subject, so ranks cost one pass over them, and a top-N view of a subject
+    is a slice of its entries. Ranks are competition ranks (1, 2, 2, 4); a
+    percentile is the share of the subject's students who scored the same
+    or lower.
+    """
+
+    def __init__(self, df, subjects):
+        self.frame = df
+        self.subjects = subjects
+
+        sizes = np.diff(subjects.offsets)
+        self.ranks = tied_ranks(subjects.marks, subjects.offsets[:-1])
+        size = sizes[subjects.codes]
+        self.percentiles = 100 * (size - self.ranks + 1) / np.maximum(size, 1)
+
+    def students(self, code, within=None, top=None):
+        """The subject index's students of ``code`` with their Rank and Percentile among everyone who sat it."""
+        entries = self.subjects.entries(code, within, top)
+        return self.subjects.students_at(code, entries).assign(**{
+            "Rank": self.ranks[entries],
+            "Percentile": np.round(self.percentiles[entries], 1),
+        })
+
+
+class FilterEngine:
+    """Row masks for the dashboard filters, one cached mask per predicate, combined with bitwise operations.
+
+    A predicate is a tuple naming its kind, then its arguments:
+
+    - ``("percentage", low, high)``: Percentage from low to high, both included
+    - ``("result", value, ...)``: any of the given results
+    - ``("subject", code, min_marks)``: sat ``code`` and scored at least min_marks in it
+    - ``("roll", first, last)``: Roll No from first to last, both included
+    - ``("any", predicate, ...)`` and ``("not", predicate)``: either of, or the opposite of, other predicates
+
+    Each predicate is evaluated once over the whole dataset and its mask
+    kept, so changing one widget only evaluates that widget's predicate;
+    the rest are ANDed in from the cache.
+    """
+
+    def __init__(self, df, subjects, max_masks=FILTER_MASKS):
+        self.frame = df
+        self.subjects = subjects
+        self.max_masks = max_masks
+        self.percentages = df["Percentage"].to_numpy()
+        self.rolls = df["Roll No"].to_numpy()
+        results = pd.Categorical(df["Result"])
+        self.results, self.result_codes = results.categories, results.codes
+        self._masks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frame)
+
+    def predicate_mask(self, predicate):
+        """Cached mask of a single predicate; do not modify it."""
+        with self._lock:
+            mask = self._masks.get(predicate)
+            if mask is not None:
+                self._masks.move_to_end(predicate)
+                return mask
+        mask = self.evaluate(*predicate)
+        mask.flags.writeable = False
+        with self._lock:
+            self._masks[predicate] = mask
+            while len(self._masks) > self.max_masks:
+                self._masks.popitem(last=False)
+        return mask
+
+    def evaluate(self, kind, *args):
+        if kind == "percentage":
+            low, high = args
+            return (self.percentages >= low) & (self.percentages <= high)
+        if kind == "result":
+            codes = self.results.get_indexer(list(args))
+            return np.isin(self.result_codes, codes[codes >= 0])
+        if kind == "subject":
+            code, min_marks = args
+            span = self.subjects.span(code)
+            # One subject's entries are sorted by marks, highest first
+            taken = np.searchsorted(-self.subjects.marks[span].astype(np.int32), -min_marks, side="right")
+            mask = np.zeros(len(self.frame), dtype=bool)
+            mask[self.subjects.rows[span][:taken]] = True
+            return mask
+        if kind == "roll":
+            first, last = args
+            return (self.rolls >= int(first)) & (self.rolls <= int(last))
+        if kind == "any":
+            return np.logical_or.reduce([self.predicate_mask(predicate) for predicate in args] or [self.none()])
+        if kind == "not":
+            return ~self.predicate_mask(*args)
+        raise ValueError(f"Unknown filter predicate: {kind!r}")
+
+    def none(self):
+        return np.zeros(len(self.frame), dtype=bool)
+
+    def mask(self, *predicates, within=None):
+        """Rows matching every predicate, and in ``within`` (a row subset of the frame) if given, as one boolean mask."""
+        mask = np.ones(len(self.frame), dtype=bool)
+        for predicate in predicates:
+            mask &= self.predicate_mask(predicate)
+        if within is not None and len(within) != len(self.frame):
+            mask &= self.subjects.row_mask(within)
+        return mask
+
+    def select(self, *predicates, within=None):
+        """The frame's rows matching every predicate (and in ``within``), in their original order."""
+        return self.frame[self.mask(*predicates, within=within)]
+
+
+class SearchIndex:
+    """Roll number and name search over a parsed dataset, built once instead of rescanning columns per keystroke.
+
+    Every row is packed into one byte string as its zero-padded roll number
+    and lower-cased name. Each n-gram keeps the sorted positions where it
+    occurs, so a substring search intersects a few shifted position lists
+    with no need to re-check candidates; shorter queries scan the packed
+    text in one numpy pass. Roll numbers are also kept sorted, for prefix and
+    range lookups. Results are sorted row positions in the indexed frame.
+    """
+
+    def __init__(self, df):
+        self.size = len(df)
+        rolls = df["Roll No"].to_numpy()
+        self.roll_order = np.argsort(rolls, kind="stable")
+        self.sorted_rolls = rolls[self.roll_order]
+
+        # "<roll>\0<name>" per row, rows separated by \1
+        names = df["Name"].str.lower().tolist()
+        self.text = "\1".join([f"{roll:0{ROLL_WIDTH}d}\0{name}" for roll, name in zip(rolls.tolist(), names)]).encode()
+        self.packed = np.frombuffer(self.text, dtype=np.uint8)
+        self.starts = np.concatenate([[0], np.flatnonzero(self.packed == 1) + 1])
+
+        # Positions of every n-gram that stays inside one roll number or name, grouped by n-gram
+        grams = self.grams_at(self.packed)
+        inside = np.logical_and.reduce([self.packed[shift:shift + len(grams)] > 1 for shift in range(NGRAM)])
+        positions = np.flatnonzero(inside).astype(np.uint32)
+        order = np.argsort(grams[positions], kind="stable")
+        self.positions = positions[order]
+        self.grams, first = np.unique(grams[self.positions], return_index=True)
+        self.offsets = np.concatenate([first, [len(self.positions)]])
+
+    def __len__(self):
+        return self.size
+
+    @staticmethod
+    def grams_at(data):
+        # Every NGRAM-byte window of ``data`` as one integer
+        count = max(len(data) - NGRAM + 1, 0)
+        grams = np.zeros(count, dtype=np.uint32)
+        for shift in range(NGRAM):
+            grams = (grams << 8) | data[shift:shift + count]
+        return grams
+
+    def occurrences(self, gram):
+        position = np.searchsorted(self.grams, gram)
+        if position == len(self.grams) or self.grams[position] != gram:
+            return self.positions[:0]
+        return self.positions[self.offsets[position]:self.offsets[position + 1]]
+
+    def rows_at(self, positions):
+        rows = np.searchsorted(self.starts, positions, side="right") - 1
+        if len(rows):
+            rows = rows[np.concatenate([[True], rows[1:] != rows[:-1]])]
+        return rows
+
+    def roll_prefix(self, prefix):
+        """Rows whose zero-padded roll number starts with the digits in ``prefix``."""
+        return self.roll_range(prefix, prefix)
+
+    def roll_range(self, first, last):
+        """Rows with roll numbers from prefix ``first`` through prefix ``last``, both included."""
+        low = int(first) * 10 ** (ROLL_WIDTH - len(first))
+        high = (int(last) + 1) * 10 ** (ROLL_WIDTH - len(last))
+        span = slice(np.searchsorted(self.sorted_rolls, low), np.searchsorted(self.sorted_rolls, high))
+        return np.sort(self.roll_order[span])
+
+    def contains(self, query):
+        """Rows whose roll number or lower-cased name contains ``query``."""
+        data = np.frombuffer(query.encode(), dtype=np.uint8)
+        if len(data) < NGRAM:
+            return self.scan(data)
+
+        # N-grams covering the whole query, each with its offset from the match start
+        grams = self.grams_at(data)
+        shifts = sorted(set(range(0, len(grams), NGRAM)) | {len(grams) - 1})
+        lists = sorted(((self.occurrences(grams[shift]), shift) for shift in shifts), key=lambda item: len(item[0]))
+
+        starts = None
+        for found, shift in lists:
+            found = found.astype(np.int64) - shift
+            starts = found if starts is None else np.intersect1d(starts, found, assume_unique=True)
+            if not len(starts):
+                break
+        return self.rows_at(starts)
+
+    def scan(self, data):
+        # Queries shorter than an n-gram: match byte by byte over the packed text
+        count = len(self.packed) - len(data) + 1
+        if count <= 0:
+            return self.positions[:0]
+        found = np.ones(count, dtype=bool)
+        for shift, byte in enumerate(data):
+            found &= self.packed[shift:shift + count] == byte
+        return self.rows_at(np.flatnonzero(found))
+
+    def fuzzy(self, query, limit=20):
+        """Rows sharing the most n-grams with ``query``, best first, for searches with no exact match."""
+        data = np.frombuffer(query.encode(), dtype=np.uint8)
+        grams = np.unique(self.grams_at(data))
+        if not len(grams):
+            return self.positions[:0]
+        hits = np.concatenate([self.rows_at(self.occurrences(gram)) for gram in grams])
+        counts = np.bincount(hits, minlength=self.size)
+        close = np.flatnonzero(counts >= max(1, FUZZY_MIN_SHARE * len(grams)))
+        return close[np.argsort(-counts[close], kind="stable")][:limit]
+
+    def search(self, query):
+        """Rows matching a search box entry: a roll number range ("first-last") or a roll/name substring."""
+        query = query.strip().lower()
+        if not query:
+            return np.arange(self.size)
+        bounds = ROLL_RANGE.fullmatch(query)
+        if bounds:
+            return self.roll_range(*bounds.groups())
+        return self.contains(query)
@@ -0,0 +1,191 @@
+# Background parsing of large uploads, so the script thread never waits on a parse
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cbse_store import shared_store
+
+# Uploads at least this large (in total) are parsed in the background, with their progress shown meanwhile
+BACKGROUND_MB = float(os.environ.get("CBSE_BACKGROUND_MB", 16))
+
+# Parses run at once; each can still use a process pool of its own (see default_workers())
+JOB_WORKERS = int(os.environ.get("CBSE_JOB_WORKERS", 1))
+
+# Seconds a finished job holds its dataset in the shared store, for the sessions waiting on it to pick it up
+JOB_KEEP = float(os.environ.get("CBSE_JOB_KEEP", 5 * 60))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+_current_job = contextvars.ContextVar("cbse_current_job", default=None)
+
+
+class JobCancelled(BaseException):
+    """Raised inside the parse of a cancelled job.
+
+    Like asyncio.CancelledError it is not an Exception, so the apps' error
+    handling around parsing doesn't turn a cancelled parse into an empty result.
+    """
+
+
+def report_progress(nbytes, rows):
+    """``progress`` callback for parse_batch(): counts toward the job parsing in this thread, if any.
+
+    Raises JobCancelled once that job has been cancelled.
+    """
+    job = _current_job.get()
+    if job is not None:
+        job.advance(nbytes, rows)
+
+
+class ParseJob:
+    """A parse running, or waiting to run, in the background, and the progress sessions poll while it does.
+
+    Its result goes into the shared dataset store under ``key``, where the
+    sessions waiting on it open their own handles.
+    """
+
+    def __init__(self, key, load, total_bytes):
+        self.key = key
+        self.total_bytes = total_bytes
+        self.state = QUEUED
+        self.bytes_done = 0
+        self.rows = 0
+        self.started = None
+        self.finished = None
+        self.error = None
+        self.handle = None
+        self.waiters = 0
+        self._load = load
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.state in (DONE, FAILED, CANCELLED)
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def fraction(self):
+        """Share of the upload bytes parsed so far, from 0 to 1."""
+        with self._lock:
+            return min(self.bytes_done / self.total_bytes, 1.0) if self.total_bytes else float(self.done)
+
+    def eta(self):
+        """Seconds left at the rate so far, or None before anything has been parsed."""
+        with self._lock:
+            if self.started is None or not self.bytes_done:
+                return None
+            elapsed = (self.finished or time.monotonic()) - self.started
+            return max(self.total_bytes - self.bytes_done, 0) * elapsed / self.bytes_done
+
+    def advance(self, nbytes, rows):
+        if self._cancel.is_set():
+            raise JobCancelled(self.key)
+        with self._lock:
+            self.bytes_done += nbytes
+            self.rows += rows
+
+    def cancel(self):
+        """Stop waiting on the job; the parse itself stops once no session is waiting on it."""
+        with self._lock:
+            self.waiters -= 1
+            if self.waiters <= 0 and not self.done:
+                self._cancel.set()
+
+    def run(self):
+        state = CANCELLED
+        token = _current_job.set(self)
+        try:
+            if not self._cancel.is_set():
+                self.started = time.monotonic()
+                self.state = RUNNING
+                self.handle = shared_store().open(self.key, self._load)
+                state = DONE
+        except JobCancelled:
+            pass
+        except Exception as e:
+            # Kept for the sessions waiting on the job to raise in their own script thread
+            self.error = e
+            state = FAILED
+        finally:
+            _current_job.reset(token)
+            self._load = None
+            # Finished before done, so a job is never seen done without its finish time
+            self.finished = time.monotonic()
+            self.state = state
+
+
+class JobQueue:
+    """Parse jobs run ``workers`` at a time on background threads, one job per key however many sessions ask."""
+
+    def __init__(self, workers=JOB_WORKERS, keep=JOB_KEEP):
+        self.keep = keep
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cbse-parse")
+        self._jobs = {}  # key -> ParseJob, in the order submitted
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def submit(self, key, load, total_bytes):
+        """The job storing ``load()`` under ``key``, queued now unless one is already under way.
+
+        Each caller counts as a waiter on the job until it calls ``job.cancel()``.
+        """
+        self.prune()
+        future = None
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or job.cancelled or job.state in (FAILED, CANCELLED):
+                # A fresh job goes to the back of the queue, behind those submitted before it
+                self._jobs.pop(key, None)
+                job = self._jobs[key] = ParseJob(key, load, total_bytes)
+                future = self._pool.submit(job.run)
+            job.waiters += 1
+        if future is not None:
+            # Each job finishing also lets go of those that finished long enough before it. Added outside the
+            # lock, as a job already done calls back at once, in this thread
+            future.add_done_callback(lambda _: self.prune())
+        return job
+
+    def ahead(self, job):
+        """Jobs still queued or running before ``job``."""
+        self.prune()
+        with self._lock:
+            jobs = list(self._jobs.values())
+        if job not in jobs:
+            return 0
+        return sum(not other.done for other in jobs[:jobs.index(job)])
+
+    def prune(self, now=None):
+        """Forget jobs that finished more than ``keep`` seconds ago, releasing the datasets they held."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            stale = [key for key, job in self._jobs.items() if job.done and now - job.finished > self.keep]
+            jobs = [self._jobs.pop(key) for key in stale]
+        for job in jobs:
+            if job.handle is not None:
+                job.handle.release()
+
+    def stats(self):
+        self.prune()
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {state: sum(job.state == state for job in jobs) for state in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+
+
+_jobs = None
+_jobs_lock = threading.Lock()
+
+
+def shared_jobs():
+    """The JobQueue shared by every session in this process."""
+    global _jobs
+    with _jobs_lock:
+        if _jobs is None:
+            _jobs = JobQueue()
+        return _jobs
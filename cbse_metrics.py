@@ -0,0 +1,207 @@
+# Per-stage timings and memory for parsing, exports and page renders, as structured logs or Prometheus metrics
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+logger = logging.getLogger("cbse.metrics")
+
+# Trace Python allocations so each stage reports its peak memory; costs time, so off unless asked for
+if os.environ.get("CBSE_TRACE_MEMORY") and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+# Serve the Prometheus text format on this port at /metrics, if set
+METRICS_PORT = os.environ.get("CBSE_METRICS_PORT")
+
+_current_run = contextvars.ContextVar("cbse_current_run", default=None)
+_open_stages = threading.local()
+
+# Process-wide totals behind the Prometheus metrics
+_totals_lock = threading.Lock()
+_stage_totals = {}  # stage -> [calls, wall seconds, cpu seconds]
+_run_totals = {}  # app -> [reruns, wall seconds]
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def max_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class Run:
+    """Stages recorded during one script rerun (or one CLI invocation)."""
+
+    def __init__(self, app):
+        self.app = app
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.stages = []
+        self.wall_s = None
+
+    def finish(self):
+        if self.wall_s is not None:
+            return self
+        self.wall_s = time.perf_counter() - self.started
+        with _totals_lock:
+            totals = _run_totals.setdefault(self.app, [0, 0.0])
+            totals[0] += 1
+            totals[1] += self.wall_s
+        logger.info(json.dumps(self.as_dict()))
+        return self
+
+    def as_dict(self):
+        return {
+            "app": self.app,
+            "started": self.started_at,
+            "wall_s": None if self.wall_s is None else round(self.wall_s, 6),
+            "max_rss_mb": max_rss_mb(),
+            "stages": self.stages,
+        }
+
+
+def start_run(app):
+    """Begin recording stages for the current rerun of ``app``."""
+    if METRICS_PORT:
+        serve_metrics(int(METRICS_PORT))
+    run = Run(app)
+    _current_run.set(run)
+    return run
+
+
+def current_run():
+    return _current_run.get()
+
+
+def record(name, wall_s, cpu_s, peak_mb=None, **details):
+    """Add a measured stage to the current run and to the process totals."""
+    with _totals_lock:
+        totals = _stage_totals.setdefault(name, [0, 0.0, 0.0])
+        totals[0] += 1
+        totals[1] += wall_s
+        totals[2] += cpu_s
+    run = _current_run.get()
+    if run is not None:
+        run.stages.append({
+            "stage": name,
+            "wall_s": round(wall_s, 6),
+            "cpu_s": round(cpu_s, 6),
+            "peak_mb": peak_mb,
+            "max_rss_mb": max_rss_mb(),
+            **details,
+        })
+
+
+@contextmanager
+def stage(name, **details):
+    """Time the body as pipeline stage ``name``: wall time, this thread's CPU time, and peak traced memory.
+
+    Peak memory is only measured while tracemalloc is tracing (CBSE_TRACE_MEMORY=1).
+    Every stage resets tracemalloc's peak, folding the enclosing stages' peaks
+    so far into their own, so code that wants the peak of some work must run
+    it in a stage rather than read get_traced_memory(). The stage yields a
+    dict that gets its wall_s, cpu_s and peak_mb once it ends.
+    """
+    measured = {}
+    stack = getattr(_open_stages, "stack", None)
+    if stack is None:
+        stack = _open_stages.stack = []
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        # Resetting the peak for this stage would hide the enclosing stage's peak so far; keep it aside
+        if stack:
+            stack[-1] = max(stack[-1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+    # Peaks of finished inner stages, folded into this one's when it ends
+    stack.append(0)
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield measured
+    finally:
+        wall_s, cpu_s = time.perf_counter() - wall, time.thread_time() - cpu
+        inner_peak = stack.pop()
+        peak_mb = None
+        if tracing:
+            peak = max(tracemalloc.get_traced_memory()[1], inner_peak)
+            # Memory allocated on top of what was already held when the stage began
+            peak_mb = round((peak - base) / (1 << 20), 3)
+            if stack:
+                stack[-1] = max(stack[-1], peak)
+        measured.update(wall_s=wall_s, cpu_s=cpu_s, peak_mb=peak_mb)
+        record(name, wall_s, cpu_s, peak_mb, **details)
+
+
+def prometheus_text():
+    """Process totals in the Prometheus text exposition format."""
+    with _totals_lock:
+        stages = {name: list(values) for name, values in _stage_totals.items()}
+        runs = {app: list(values) for app, values in _run_totals.items()}
+
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(f"{name}{labels} {value}" for labels, value in samples)
+
+    metric("cbse_stage_calls_total", "counter", "Times each pipeline stage ran.",
+           [(f'{{stage="{name}"}}', values[0]) for name, values in sorted(stages.items())])
+    metric("cbse_stage_seconds_total", "counter", "Wall time spent in each pipeline stage.",
+           [(f'{{stage="{name}"}}', round(values[1], 6)) for name, values in sorted(stages.items())])
+    metric("cbse_stage_cpu_seconds_total", "counter", "CPU time of the calling thread in each pipeline stage.",
+           [(f'{{stage="{name}"}}', round(values[2], 6)) for name, values in sorted(stages.items())])
+    metric("cbse_reruns_total", "counter", "Script reruns recorded per app.",
+           [(f'{{app="{app}"}}', values[0]) for app, values in sorted(runs.items())])
+    metric("cbse_rerun_seconds_total", "counter", "Wall time of recorded reruns per app.",
+           [(f'{{app="{app}"}}', round(values[1], 6)) for app, values in sorted(runs.items())])
+    rss = max_rss_mb()
+    if rss is not None:
+        metric("cbse_max_rss_bytes", "gauge", "Peak resident memory of this process.", [("", int(rss * (1 << 20)))])
+    return "\n".join(lines) + "\n"
+
+
+def serve_metrics(port):
+    """Start the /metrics endpoint once per process, in a background thread."""
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    with _server_lock:
+        if _server is not None:
+            return _server
+        try:
+            _server = ThreadingHTTPServer(("", port), MetricsHandler)
+        except OSError as e:
+            # Another app process on this machine already serves the port
+            logger.warning(f"Could not serve metrics on port {port}: {e}")
+            _server = False
+            return _server
+        threading.Thread(target=_server.serve_forever, name="cbse-metrics", daemon=True).start()
+        return _server
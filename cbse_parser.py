@@ -0,0 +1,1170 @@
+# Gazette parsing shared by the CBSE result extractor apps
+import codecs
+import glob
+import hashlib
+import mmap
+import multiprocessing
+import os
+import re
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from itertools import chain, islice
+
+import numpy as np
+import pandas as pd
+
+from cbse_metrics import record, stage
+
+# Bytes read and decoded per step when parsing a file or upload
+CHUNK_SIZE = 1 << 20
+
+# Roll number line: Roll No, F, Name, five subject codes, and the result as the last field
+ROLL_LINE = re.compile(
+    r"(\d{8})\s+F\s+([A-Z\'\s]+)\s+"  # Roll No & Name
+    r"(\d{3})\s+(\d{3})\s+(\d{3})\s+(\d{3})\s+(\d{3})\s+.*?"  # Subject codes
+    r"(PASS|COMP|ESSENTIAL REPEAT|FAIL|\S+)\s*$"  # Result
+)
+
+# Marks line: indented "marks grade" pairs, one per subject
+MARKS_LINE = re.compile(r"\s+((?:\d{3}\s+[A-Z0-9]+(?:\s+|$)){5})")
+
+VALID_RESULTS = ['PASS', 'COMP', 'ESSENTIAL REPEAT', 'FAIL']
+
+# Everything str.splitlines() treats as a line boundary
+LINE_BREAKS = "\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+
+# Digits in a roll number; Roll No is stored as uint32, so leading zeros are restored (roll_text()) in tables and exports
+ROLL_WIDTH = 8
+
+# Subjects kept per student (Sub1..Sub5)
+SUBJECT_SLOTS = 5
+
+# Lines after a roll number line that the line-scanning parser searches for marks
+SCAN_WINDOW = 5
+
+# Records ColumnBuilder.extend() turns into columns at a time
+BUILD_BATCH = 4096
+
+
+def arrow_string_dtype():
+    # pandas 3's default "str" dtype, spelled out so older pandas doesn't keep one Python object per name
+    try:
+        try:
+            return pd.StringDtype("pyarrow", na_value=np.nan)
+        except TypeError:
+            # pandas before 2.3 has no na_value; its Arrow strings mark missing names with pd.NA
+            return pd.StringDtype("pyarrow")
+    except ImportError:
+        return pd.StringDtype("python")
+
+
+# Names are held in one Arrow string array rather than as a Python str per row
+NAME_DTYPE = arrow_string_dtype()
+
+# Characters of gazette text handed to each worker in parallel mode
+SHARD_SIZE = 4 << 20
+
+# Line starts where a shard may be cut: nothing before them is needed to parse what follows
+RECORD_START = re.compile(r"^[ \t]*\d{8}\s+F", re.MULTILINE)
+
+# School header near the top of a gazette, e.g. "SCHOOL : - 12345  KENDRIYA VIDYALAYA"
+SCHOOL_LINE = re.compile(r"SCHOOL\s*:\s*-?\s*(\d{5})[ \t]*([^\r\n]*)")
+
+# Bytes at the start of a gazette searched for the school header
+HEADER_SIZE = 64 << 10
+
+# Share of record blocks an upload must have in common with the last one of the same name and school to be
+# re-parsed as a revision of it; below this, it is another gazette that happens to have the same name
+REVISION_MIN_SHARED = 0.5
+
+# A single line boundary as str.splitlines() sees it
+LINE_END = re.compile(r"\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+
+# The same boundaries in UTF-8 encoded gazette bytes
+BYTE_LINE_END = re.compile(rb"\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e]|\xc2\x85|\xe2\x80[\xa8\xa9]")
+
+# Roll number line starts in raw gazette bytes; record blocks are cut here for incremental re-parsing
+BLOCK_START = re.compile(rb"^[ \t]*\d{8}\s+F", re.MULTILINE)
+
+# Bytes of blake2b digest kept per record block
+BLOCK_DIGEST_SIZE = 8
+
+# Single-byte line breaks, as str.splitlines() sees them
+BREAK_BYTES = np.frombuffer(b"\n\r\x0b\x0c\x1c\x1d\x1e", dtype=np.uint8)
+
+# Blanks that separate tokens within a line of ASCII text
+BLANK_BYTES = np.frombuffer(b" \t", dtype=np.uint8)
+
+# A line scan_record() accepts (\d{8}\s+F\s+ once stripped), matched from the line start in ASCII bytes
+SCAN_LINE = re.compile(rb"[ \t]*\d{8}[ \t]+F[ \t]+(?=[^ \t])")
+
+# In a candidate line with single spaces between tokens: the space before the name, after "<roll> F"
+SCAN_NAME_START = 10
+
+# Token shapes of a candidate line: digits become "0", anything else but spaces "a"
+SCAN_SHAPE = bytes.maketrans(bytes(range(256)), bytes(
+    ord("0") if chr(byte).isdigit() else ord(" ") if byte == ord(" ") else ord("a") for byte in range(256)
+))
+
+# A run of three-digit tokens in a shape, which scan_record() takes as the subject codes
+SCAN_CODE_RUN = re.compile(rb"(?: 000)+(?= )")
+
+# "marks grade" pairs scan_record() reads from the lines after a candidate
+SCAN_MARKS = re.compile(rb"(\d{3})\s+[A-Z0-9]+")
+
+# Results scan_record() looks for anywhere in a candidate line, first match wins
+SCAN_RESULTS = [(result.encode(), result) for result in VALID_RESULTS]
+
+
+def split_chunks(chunks):
+    """Yield lines from an iterable of text chunks, same as str.splitlines() on the joined text.
+
+    Only the unfinished line at the end of each chunk is carried into the next one.
+    """
+    carry = ''
+    for chunk in chunks:
+        if not chunk:
+            continue
+        lines = (carry + chunk).splitlines(True)
+        last = lines[-1]
+        # A trailing "\r" may be the first half of a "\r\n" split across chunks
+        if last[-1] not in LINE_BREAKS or last[-1] == '\r':
+            carry = lines.pop()
+        else:
+            carry = ''
+        for line in lines:
+            yield line.rstrip(LINE_BREAKS)
+    if carry:
+        yield carry.rstrip(LINE_BREAKS)
+
+
+def iter_lines(text, chunk_size=CHUNK_SIZE):
+    """Yield the lines of ``text`` one at a time without splitting it up front."""
+    return split_chunks(text[i:i + chunk_size] for i in range(0, len(text), chunk_size))
+
+
+def iter_decoded(stream, chunk_size=CHUNK_SIZE, encoding="utf-8"):
+    """Read a binary stream in fixed-size chunks and yield them decoded.
+
+    Time spent reading and decoding is recorded as the "decode" stage once the stream is done.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    wall = cpu = 0.0
+    size = 0
+    while True:
+        started, started_cpu = time.perf_counter(), time.thread_time()
+        chunk = stream.read(chunk_size)
+        final = not chunk
+        text = decoder.decode(chunk, final)
+        wall += time.perf_counter() - started
+        cpu += time.thread_time() - started_cpu
+        size += len(chunk)
+        if final:
+            record("decode", wall, cpu, bytes=size)
+        yield text
+        if final:
+            return
+
+
+def iter_file_lines(stream, chunk_size=CHUNK_SIZE, encoding="utf-8"):
+    """Decode a binary stream in fixed-size chunks and yield its lines.
+
+    Memory use is bounded by the chunk size rather than by the size of the gazette.
+    """
+    return split_chunks(iter_decoded(stream, chunk_size, encoding))
+
+
+def make_record(roll_match, marks_match):
+    # Records are (roll, name, subject codes, marks, result) tuples
+    result = roll_match.group(8)
+    if result not in VALID_RESULTS:
+        result = 'COMP'
+
+    marks_fields = marks_match.group(1).split()
+    return (
+        roll_match.group(1),
+        roll_match.group(2).strip(),
+        roll_match.group(3, 4, 5, 6, 7),
+        [int(marks_fields[k]) for k in range(0, 10, 2)],
+        result,
+    )
+
+
+def iter_records(lines, limit=None, roll_lines=None):
+    """Walk the gazette once, pairing each roll number line with the marks line right after it.
+
+    A roll line only takes the next non-blank line as its marks, so a stray or
+    missing marks line drops that one student instead of shifting everyone after it.
+    With ``limit``, records are only started on the first ``limit`` lines. With
+    a ``roll_lines`` list, the index of each record's roll number line is appended to it.
+    """
+    pending = None
+    pending_index = None
+    for index, line in enumerate(lines):
+        if limit is not None and index >= limit and pending is None:
+            return
+
+        if not line or line.isspace():
+            continue
+
+        roll_match = ROLL_LINE.search(line)
+        if roll_match:
+            if limit is not None and index >= limit:
+                break
+            if pending is not None:
+                print(f"Skipped record {pending.group(1)}: no marks line found")
+            pending, pending_index = roll_match, index
+            continue
+
+        if pending is None:
+            continue
+
+        roll_match, pending = pending, None
+        marks_match = MARKS_LINE.match(line)
+        if marks_match is None:
+            print(f"Skipped record {roll_match.group(1)}: no marks line found")
+            continue
+
+        try:
+            record = make_record(roll_match, marks_match)
+        except Exception as e:
+            print(f"Skipped record due to error: {e}")
+            continue
+        if roll_lines is not None:
+            roll_lines.append(pending_index)
+        yield record
+
+    if pending is not None:
+        print(f"Skipped record {pending.group(1)}: no marks line found")
+
+
+def scan_record(window):
+    # Line-scanning parser from tfri.py: window[0] is the candidate line, the rest is lookahead
+    line = window[0].strip()
+    if not re.match(r"\d{8}\s+F\s+", line):
+        return None
+
+    parts = line.split()
+    roll = parts[0]
+    name_parts = []
+    idx = 2
+    while idx < len(parts) and not re.match(r"\d{3}$", parts[idx]):
+        name_parts.append(parts[idx])
+        idx += 1
+    name = ' '.join(name_parts)
+
+    subject_codes = []
+    while idx < len(parts) and re.match(r"\d{3}$", parts[idx]):
+        subject_codes.append(parts[idx])
+        idx += 1
+
+    possible_results = ['PASS', 'COMP', 'ESSENTIAL REPEAT', 'FAIL']
+    joined_line = ' '.join(parts)
+    result = next((res for res in possible_results if res in joined_line), 'PASS')
+
+    marks = []
+    for mark_line in islice(window, 1, SCAN_WINDOW + 1):
+        line_marks = re.findall(r"(\d{3})\s+[A-Z0-9]+", mark_line)
+        if line_marks:
+            marks.extend(map(int, line_marks))
+            if len(marks) >= 5:
+                break
+
+    marks = marks[:5] + [0] * (5 - len(marks))
+    subject_codes = subject_codes[:5] + [''] * (5 - len(subject_codes))
+
+    return roll, name, subject_codes, marks, result
+
+
+def iter_scanned_records(lines, limit=None):
+    """Line-scanning parser: looks for marks in up to five lines after each roll number line.
+
+    Only a sliding window of SCAN_WINDOW + 1 lines is kept in memory. With
+    ``limit``, records are only started on the first ``limit`` lines; the
+    lines after that are used as lookahead only.
+    """
+    window = deque()
+    remaining = limit
+
+    def take():
+        try:
+            return scan_record(window)
+        except Exception as e:
+            print(f"Skipped record due to error: {e}")
+            return None
+        finally:
+            window.popleft()
+
+    for line in lines:
+        window.append(line)
+        if len(window) > SCAN_WINDOW:
+            if remaining is not None:
+                if remaining == 0:
+                    return
+                remaining -= 1
+            record = take()
+            if record is not None:
+                yield record
+
+    while window and remaining != 0:
+        if remaining is not None:
+            remaining -= 1
+        record = take()
+        if record is not None:
+            yield record
+
+
+def line_breaks(codes):
+    """Start and end offsets of every line break in UTF-8 text, the breaks str.splitlines() splits at."""
+    starts = np.flatnonzero(np.isin(codes, BREAK_BYTES))
+    widths = np.ones(len(starts), dtype=np.int64)
+    # "\r\n" is one break: keep the "\r", two bytes wide
+    pair = np.zeros(len(starts), dtype=bool)
+    if len(starts) > 1:
+        pair[1:] = (codes[starts[1:]] == 10) & (codes[starts[:-1]] == 13) & (starts[1:] == starts[:-1] + 1)
+        widths[:-1][pair[1:]] = 2
+    starts, widths = starts[~pair], widths[~pair]
+
+    if len(codes) and codes.max() > 127:
+        # NEL (\xc2\x85), LS and PS (\xe2\x80\xa8, \xe2\x80\xa9)
+        nel = np.flatnonzero((codes[1:] == 0x85) & (codes[:-1] == 0xc2))
+        separators = np.flatnonzero(((codes[2:] == 0xa8) | (codes[2:] == 0xa9)) & (codes[1:-1] == 0x80) & (codes[:-2] == 0xe2))
+        starts = np.concatenate([starts, nel, separators])
+        widths = np.concatenate([widths, np.full(len(nel), 2), np.full(len(separators), 3)])
+        order = np.argsort(starts, kind="stable")
+        starts, widths = starts[order], widths[order]
+    return starts, starts + widths
+
+
+def line_bounds(codes):
+    # Start and end offsets of each line, split exactly as str.splitlines() would split the decoded text
+    breaks, after = line_breaks(codes)
+    starts = np.concatenate([[0], after])
+    if starts[-1] == len(codes):
+        return starts[:-1], breaks
+    return starts, np.append(breaks, len(codes))
+
+
+def scan_bytes(data, owned=None):
+    """Byte-level fast path for iter_scanned_records(), returning the same records from raw gazette bytes.
+
+    Line bounds and candidate lines are found with numpy over the whole
+    buffer, so Python only loops over candidates. Each candidate line is
+    split once, and its subject codes are found by translating it to token
+    shapes and searching those, instead of a regex per token.
+    Records only start before ``owned``. Returns the byte offset each record
+    starts at and the records, or None for text that isn't plain ASCII,
+    which iter_scanned_records() has to handle.
+    """
+    codes = np.frombuffer(data, dtype=np.uint8)
+    # \x1f is whitespace to str.split() but not to bytes.split()
+    if len(codes) and (codes.max() > 127 or (codes == 0x1f).any()):
+        return None
+    owned = len(codes) if owned is None else owned
+    starts, ends = line_bounds(codes)
+
+    # Every accepted line has an "F" between blanks; only lines with one are matched against SCAN_LINE
+    flags = np.flatnonzero(codes[1:-1] == ord("F")) + 1
+    flags = flags[np.isin(codes[flags - 1], BLANK_BYTES) & np.isin(codes[flags + 1], BLANK_BYTES)]
+    lines = np.unique(np.searchsorted(starts, flags, side="right") - 1)
+    lines = lines[starts[lines] < owned]
+
+    starts, ends, line_count = starts.tolist(), ends.tolist(), len(starts)
+    lines = [line for line in lines.tolist() if SCAN_LINE.match(data, starts[line], ends[line])]
+    offsets = np.array([starts[line] for line in lines], dtype=np.int64)
+    code_runs = {}
+    records = []
+    for line in lines:
+        parts = bytes(data[starts[line]:ends[line]]).split()
+        joined_line = b" ".join(parts)
+
+        # Name: the tokens after "F" up to the first three-digit token, where the subject codes start
+        shape = joined_line.translate(SCAN_SHAPE) + b" "
+        first_code = shape.find(b" 000 ", SCAN_NAME_START)
+        if first_code < 0:
+            name, subject_codes = joined_line[SCAN_NAME_START + 1:].decode(), []
+        else:
+            last_code = SCAN_CODE_RUN.match(shape, first_code).end()
+            name = joined_line[SCAN_NAME_START + 1:first_code].decode()
+            # Gazettes repeat a few subject combinations, so each distinct run is decoded once
+            run = joined_line[first_code:last_code]
+            subject_codes = code_runs.get(run) or code_runs.setdefault(run, run.decode().split())
+
+        for pattern, result in SCAN_RESULTS:
+            if pattern in joined_line:
+                break
+        else:
+            result = 'PASS'
+
+        marks = []
+        for ahead in range(line + 1, min(line + 1 + SCAN_WINDOW, line_count)):
+            line_marks = SCAN_MARKS.findall(data, starts[ahead], ends[ahead])
+            if line_marks:
+                marks.extend(map(int, line_marks))
+                if len(marks) >= 5:
+                    break
+
+        marks = marks[:5] + [0] * (5 - len(marks))
+        subject_codes = subject_codes[:5] + [''] * (5 - len(subject_codes))
+        records.append((parts[0].decode(), name, subject_codes, marks, result))
+    return offsets, records
+
+
+def regex_bytes(data, owned=None):
+    """Byte-level driver for iter_records(): the buffer is decoded once and its lines walked in one pass.
+
+    Returns the byte offset each record's roll number line starts at and the
+    records, the same as iter_records() gives for the decoded lines. Records
+    only start before ``owned``.
+    """
+    starts, _ = line_bounds(np.frombuffer(data, dtype=np.uint8))
+    limit = None
+    if owned is not None and owned < len(data):
+        limit = int(np.searchsorted(starts, owned))
+    roll_lines = []
+    records = list(iter_records(iter_lines(str(data, "utf-8")), limit, roll_lines))
+    return starts[np.array(roll_lines, dtype=np.int64)], records
+
+
+def add_codes(mapping, values):
+    # Give values not yet in ``mapping`` the next codes, in order of first appearance
+    for value in dict.fromkeys(values):
+        mapping.setdefault(value, len(mapping))
+    return values
+
+
+class ColumnBuilder:
+    """Typed column buffers filled one student at a time.
+
+    Roll numbers, marks and dictionary codes go into array.array buffers that
+    numpy wraps without copying; Total and Percentage are computed once at the end.
+    """
+
+    def __init__(self):
+        self.rolls = array('I')
+        self.names = []
+        self.code_slots = [array('h') for _ in range(SUBJECT_SLOTS)]
+        self.mark_slots = [array('h') for _ in range(SUBJECT_SLOTS)]
+        self.results = array('h')
+        self.subject_codes = {}
+        self.result_codes = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def append(self, roll, name, sub_codes, marks, result):
+        self.rolls.append(int(roll))
+        self.names.append(name)
+        subject_codes = self.subject_codes
+        for slot, code, mark in zip(range(SUBJECT_SLOTS), sub_codes, marks):
+            self.code_slots[slot].append(subject_codes.setdefault(code, len(subject_codes)))
+            self.mark_slots[slot].append(mark)
+        self.results.append(self.result_codes.setdefault(result, len(self.result_codes)))
+
+    def extend(self, records):
+        # Column by column, a batch at a time: far fewer Python-level appends than append() per record
+        records = iter(records)
+        subject_codes, result_codes = self.subject_codes, self.result_codes
+        while True:
+            batch = list(islice(records, BUILD_BATCH))
+            if not batch:
+                return self
+            rolls, names, sub_codes, marks, results = zip(*batch)
+            self.rolls.extend(map(int, rolls))
+            self.names.extend(names)
+            for slot, codes, slot_marks in zip(range(SUBJECT_SLOTS), zip(*sub_codes), zip(*marks)):
+                self.code_slots[slot].extend(map(subject_codes.__getitem__, add_codes(subject_codes, codes)))
+                self.mark_slots[slot].extend(slot_marks)
+            self.results.extend(map(result_codes.__getitem__, add_codes(result_codes, results)))
+
+    @classmethod
+    def from_frame(cls, df):
+        """Rebuild the buffers behind a frame produced by to_frame()."""
+        builder = cls()
+        builder.rolls.frombytes(df["Roll No"].to_numpy(dtype=np.uint32).tobytes())
+        builder.names.extend(df["Name"].tolist())
+        for slot in range(SUBJECT_SLOTS):
+            builder.code_slots[slot].frombytes(category_codes(df[f"Sub{slot + 1} Code"], builder.subject_codes))
+            builder.mark_slots[slot].frombytes(df[f"Sub{slot + 1} Marks"].to_numpy(dtype=np.int16).tobytes())
+        builder.results.frombytes(category_codes(df["Result"], builder.result_codes))
+        return builder
+
+    def absorb(self, other):
+        """Append everything from another builder, remapping its dictionary codes onto ours."""
+        subject_map = remap_codes(other.subject_codes, self.subject_codes)
+        result_map = remap_codes(other.result_codes, self.result_codes)
+
+        self.rolls.extend(other.rolls)
+        self.names.extend(other.names)
+        for slot in range(SUBJECT_SLOTS):
+            codes = np.frombuffer(other.code_slots[slot], dtype=np.int16)
+            self.code_slots[slot].frombytes(subject_map[codes].tobytes())
+            self.mark_slots[slot].extend(other.mark_slots[slot])
+        self.results.frombytes(result_map[np.frombuffer(other.results, dtype=np.int16)].tobytes())
+        return self
+
+    def to_frame(self):
+        subjects = categorical_dtype(self.subject_codes)
+        results = categorical_dtype(self.result_codes)
+
+        marks = [np.frombuffer(slot, dtype=np.int16) for slot in self.mark_slots]
+        total = np.add.reduce(marks, dtype=np.int32)
+
+        columns = {"Roll No": np.frombuffer(self.rolls, dtype=np.uint32), "Name": pd.array(self.names, dtype=NAME_DTYPE)}
+        for slot in range(SUBJECT_SLOTS):
+            columns[f"Sub{slot + 1} Code"] = dictionary_column(self.code_slots[slot], self.subject_codes, subjects)
+            columns[f"Sub{slot + 1} Marks"] = marks[slot]
+        columns["Total"] = total
+        columns["Percentage"] = np.round(total / SUBJECT_SLOTS, 2)
+        columns["Result"] = dictionary_column(self.results, self.result_codes, results)
+
+        return pd.DataFrame(columns, copy=False)
+
+
+def remap_codes(source, target):
+    # Lookup table from codes in ``source`` to codes in ``target``, adding new values to ``target``
+    remap = np.empty(len(source), dtype=np.int16)
+    for value, code in source.items():
+        remap[code] = target.setdefault(value, len(target))
+    return remap
+
+
+def category_codes(column, target):
+    # Codes of a categorical column re-expressed against ``target``, as int16 bytes
+    source = {value: code for code, value in enumerate(column.cat.categories)}
+    return remap_codes(source, target)[column.cat.codes.to_numpy()].tobytes()
+
+
+def categorical_dtype(codes):
+    return pd.CategoricalDtype(sorted(codes))
+
+
+def compact_frame(df):
+    """``df`` in the schema to_frame() builds, converting only the columns that aren't in it already.
+
+    Roll No is uint32, marks int16, Total int32, Percentage float64, names Arrow strings, and
+    Result and the Sub Code columns categorical, all Sub Code columns
+    sharing one subject dictionary. Frames read back from elsewhere (e.g.
+    the parse cache under an older pandas) may differ.
+    """
+    code_columns = [f"Sub{slot + 1} Code" for slot in range(SUBJECT_SLOTS) if f"Sub{slot + 1} Code" in df]
+    dtypes = {"Roll No": np.dtype(np.uint32), "Name": NAME_DTYPE, "Total": np.dtype(np.int32),
+              "Percentage": np.dtype(np.float64)}
+    dtypes.update({f"Sub{slot + 1} Marks": np.dtype(np.int16) for slot in range(SUBJECT_SLOTS)})
+    subjects = {df[column].dtype for column in code_columns}
+    if len(subjects) != 1 or not isinstance(next(iter(subjects)), pd.CategoricalDtype):
+        codes = set()
+        for column in code_columns:
+            codes.update(df[column].dropna().unique())
+        dtypes.update(dict.fromkeys(code_columns, categorical_dtype(codes)))
+    if "Result" in df and not isinstance(df["Result"].dtype, pd.CategoricalDtype):
+        dtypes["Result"] = "category"
+
+    convert = {column: dtype for column, dtype in dtypes.items() if column in df and df[column].dtype != dtype}
+    return df.astype(convert) if convert else df
+
+
+def dictionary_column(buffer, codes, dtype):
+    # Remap first-seen codes onto the sorted categories of ``dtype``
+    remap = np.empty(len(codes), dtype=np.int16)
+    for value, code in codes.items():
+        remap[code] = dtype.categories.get_loc(value)
+    return pd.Categorical.from_codes(remap[np.frombuffer(buffer, dtype=np.int16)], dtype=dtype)
+
+
+def roll_text(rolls):
+    """Roll numbers as zero-padded strings, for searching and display."""
+    return rolls.astype(str).str.zfill(ROLL_WIDTH)
+
+
+PARSERS = {
+    "regex": iter_records,
+    "scan": iter_scanned_records,
+}
+
+# Parsers with a fast path over raw bytes, used when parsing from a buffer
+BYTE_PARSERS = {
+    "scan": scan_bytes,
+}
+
+# Byte-level drivers that also give each record's offset, for parsing every block of a buffer in one pass
+OFFSET_PARSERS = {
+    "regex": regex_bytes,
+    "scan": scan_bytes,
+}
+
+
+# Lookahead lines each parser needs past the end of a shard
+CONTEXT_LINES = {
+    "regex": 0,
+    "scan": SCAN_WINDOW,
+}
+
+
+def default_workers():
+    """Worker processes for parallel parsing: CBSE_PARSE_WORKERS, or one per CPU."""
+    return int(os.environ.get("CBSE_PARSE_WORKERS", 0)) or os.cpu_count() or 1
+
+
+def context_end(text, start, lines, line_end=LINE_END):
+    # Offset just past ``lines`` line boundaries from ``start``, or None if the text runs out first
+    if lines == 0:
+        return start
+    for count, match in enumerate(line_end.finditer(text, start), 1):
+        if count == lines:
+            return match.end()
+    return None
+
+
+def iter_shards(chunks, context_lines, shard_size=SHARD_SIZE):
+    """Regroup decoded text into shards of roughly ``shard_size`` characters.
+
+    Shards are only cut at the start of a roll number line. Each shard is a
+    ``(text, owned)`` pair: records start in ``text[:owned]``, and the rest is
+    lookahead copied from the start of the next shard.
+    """
+    buffer = ''
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) > shard_size:
+            match = RECORD_START.search(buffer, shard_size)
+            end = match and context_end(buffer, match.start(), context_lines)
+            if end is None:
+                break
+            cut = match.start()
+            yield buffer[:end], cut
+            buffer = buffer[cut:]
+    if buffer:
+        yield buffer, len(buffer)
+
+
+def parse_shard(parser, text, owned):
+    limit = None
+    if owned < len(text):
+        limit = sum(1 for _ in LINE_END.finditer(text, 0, owned))
+    return ColumnBuilder().extend(PARSERS[parser](iter_lines(text), limit))
+
+
+def parse_shards(shards, parser, workers):
+    """Parse shards in a process pool and merge the results in file order."""
+    builder = ColumnBuilder()
+    shards = iter(shards)
+    head = list(islice(shards, 2))
+    if len(head) < 2 or workers <= 1:
+        # A single shard is not worth starting a pool for
+        for text, owned in chain(head, shards):
+            builder.absorb(parse_shard(parser, text, owned))
+        return builder
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = deque()
+        for text, owned in chain(head, shards):
+            pending.append(pool.submit(parse_shard, parser, text, owned))
+            # Keep a bounded number of shards in flight so memory stays flat
+            if len(pending) >= 2 * workers:
+                builder.absorb(pending.popleft().result())
+        while pending:
+            builder.absorb(pending.popleft().result())
+    return builder
+
+
+def parse_gazette(content, parser="regex", workers=1):
+    """Parse gazette text into one row per student.
+
+    With ``workers`` > 1, large gazettes are split at roll number lines and parsed
+    in that many processes; the result is identical to the serial parse.
+    """
+    if workers <= 1:
+        return ColumnBuilder().extend(PARSERS[parser](iter_lines(content))).to_frame()
+    chunks = (content[i:i + CHUNK_SIZE] for i in range(0, len(content), CHUNK_SIZE))
+    return parse_shards(iter_shards(chunks, CONTEXT_LINES[parser]), parser, workers).to_frame()
+
+
+def parse_gazette_file(stream, parser="regex", chunk_size=CHUNK_SIZE, workers=None):
+    """Parse a binary gazette stream (an upload or an open file) chunk by chunk.
+
+    ``workers`` defaults to default_workers(); pass 1 to parse in this process.
+    """
+    if workers is None:
+        workers = default_workers()
+    with stage("parse", parser=parser, workers=workers):
+        if workers <= 1:
+            builder = ColumnBuilder().extend(PARSERS[parser](iter_file_lines(stream, chunk_size)))
+        else:
+            chunks = iter_decoded(stream, chunk_size)
+            builder = parse_shards(iter_shards(chunks, CONTEXT_LINES[parser]), parser, workers)
+    with stage("build_frame", rows=len(builder)):
+        return builder.to_frame()
+
+
+def block_starts(data, owned):
+    # Offsets of the BLOCK_START matches in data[:owned]; only lines holding a run of exactly eight digits are tried
+    codes = np.frombuffer(data, dtype=np.uint8)[:owned]
+    # A non-digit, eight digits, then a non-digit; padded so runs at either end of the data count
+    digit = np.zeros(len(codes) + 2, dtype=bool)
+    digit[1:-1] = (codes >= ord("0")) & (codes <= ord("9"))
+    count = max(len(codes) - 7, 0)
+    run = ~digit[:count]
+    for shift in range(1, 9):
+        run &= digit[shift:shift + count]
+    run &= ~digit[9:9 + count]
+    runs = np.flatnonzero(run)
+    line_starts = np.concatenate([[0], np.flatnonzero(codes == ord("\n")) + 1])
+    lines = np.unique(line_starts[np.searchsorted(line_starts, runs, side="right") - 1])
+    return [start for start in lines.tolist() if BLOCK_START.match(data, start, owned)]
+
+
+def split_blocks(data, context_lines=0, owned=None):
+    """Cut raw gazette bytes into record blocks, each running from one roll number line to the next.
+
+    Returns the block start offsets followed by the end of the last block,
+    and for each block the end of the bytes it is parsed from: the block
+    itself plus ``context_lines`` lines of lookahead. Only blocks starting
+    before ``owned`` are included; anything after it is lookahead.
+    """
+    owned = len(data) if owned is None else owned
+    starts = block_starts(data, owned)
+    if owned and (not starts or starts[0]):
+        # Page headers before the first roll number line
+        starts.insert(0, 0)
+    bounds = np.array(starts + [owned], dtype=np.int64)
+
+    ends = bounds[1:].copy()
+    if context_lines and len(ends):
+        # End of the context_lines-th line break at or after each block end, or the end of the data
+        breaks, after = line_breaks(np.frombuffer(data, dtype=np.uint8))
+        last = np.searchsorted(breaks, ends) + context_lines - 1
+        within = last < len(breaks)
+        ends[within] = after[last[within]]
+        ends[~within] = len(data)
+    return bounds, ends
+
+
+def block_digests(data, bounds, ends):
+    """Digest of each block's bytes, lookahead included, as uint64."""
+    view = memoryview(data)
+    digests = b"".join(
+        hashlib.blake2b(view[start:end], digest_size=BLOCK_DIGEST_SIZE).digest()
+        for start, end in zip(bounds[:-1].tolist(), ends.tolist())
+    )
+    return np.frombuffer(digests, dtype=np.uint64)
+
+
+def parse_blocks(parser, data, bounds, ends, blocks=None):
+    """Parse the given record blocks (all of them by default) into one builder.
+
+    Also returns the number of students each block gave. Blocks are decoded
+    one at a time, so only the bytes being parsed are ever held as text.
+    """
+    records = PARSERS[parser]
+    scan = BYTE_PARSERS.get(parser)
+    if blocks is None:
+        # Every block in one pass; each record counts against the block it starts in
+        scanned = OFFSET_PARSERS[parser](data, int(bounds[-1]))
+        if scanned is not None:
+            offsets, found = scanned
+            block_of = np.searchsorted(bounds, offsets, side="right") - 1
+            return ColumnBuilder().extend(found), np.bincount(block_of, minlength=len(ends)).astype(np.uint32)
+
+    starts, owned_ends, ends = bounds[:-1].tolist(), bounds[1:].tolist(), ends.tolist()
+    if blocks is None:
+        blocks = range(len(ends))
+
+    builder = ColumnBuilder()
+    counts = np.zeros(len(blocks), dtype=np.uint32)
+    for i, block in enumerate(blocks):
+        start, owned, end = starts[block], owned_ends[block], ends[block]
+        before = len(builder)
+        scanned = scan and scan(data[start:end], owned - start)
+        if scanned is not None:
+            builder.extend(scanned[1])
+        else:
+            limit = None
+            if end > owned:
+                limit = sum(1 for _ in BYTE_LINE_END.finditer(data, start, owned))
+            builder.extend(records(str(data[start:end], "utf-8").splitlines(), limit))
+        counts[i] = len(builder) - before
+    return builder, counts
+
+
+def parse_block_shard(parser, data, owned, blocks=True):
+    # Blocks starting in data[:owned], with the block table (digests, students per block) that describes them;
+    # without ``blocks``, in one pass and with no table
+    if not blocks:
+        scan = BYTE_PARSERS.get(parser)
+        scanned = scan and scan(data, owned)
+        if scanned is not None:
+            return ColumnBuilder().extend(scanned[1]), None
+        limit = None
+        if owned < len(data):
+            # Shards are cut at line starts, so the lines before ``owned`` are the shard's own
+            limit = sum(1 for _ in BYTE_LINE_END.finditer(data, 0, owned))
+        return ColumnBuilder().extend(PARSERS[parser](iter_lines(str(data, "utf-8")), limit)), None
+    bounds, ends = split_blocks(data, CONTEXT_LINES[parser], owned)
+    builder, counts = parse_blocks(parser, data, bounds, ends)
+    return builder, (block_digests(data, bounds, ends), counts)
+
+
+def iter_block_shards(data, context_lines, shard_size=SHARD_SIZE):
+    # (start, owned end, end with lookahead) byte ranges of roughly ``shard_size``, cut at block starts
+    start = 0
+    while start < len(data):
+        match = BLOCK_START.search(data, start + shard_size)
+        cut = match.start() if match else len(data)
+        yield start, cut, context_end(data, cut, context_lines, BYTE_LINE_END) or len(data)
+        start = cut
+
+
+def join_blocks(tables):
+    # One block table from those of consecutive shards
+    digests, counts = zip(*tables)
+    return np.concatenate(digests), np.concatenate(counts)
+
+
+def parse_gazette_blocks(data, parser="regex", workers=1, progress=None, blocks=True):
+    """Parse gazette bytes block by block, for results that may later be revised.
+
+    Returns the builder and the block table: the digest of every record
+    block and how many students it gave, which reparse_gazette() needs to
+    reuse unchanged blocks. The students are the same as parse_gazette_file()
+    gives. With ``workers`` > 1, large gazettes are parsed in shards of whole
+    blocks in that many processes.
+
+    Without ``blocks`` no block table is built and None is returned in its
+    place; each shard is then parsed in one pass, which is what first uploads
+    need (see parse_batch()).
+
+    ``progress``, if given, is called with the bytes consumed and the students
+    found as each shard is done; it may raise to stop the parse.
+    """
+    shards = list(iter_block_shards(data, CONTEXT_LINES[parser]))
+    if len(shards) <= 1:
+        builder, table = parse_block_shard(parser, data, len(data), blocks)
+        if progress is not None:
+            progress(len(data), len(builder))
+        return builder, table if blocks else None
+
+    builder = ColumnBuilder()
+    tables = []
+
+    def take(part, nbytes):
+        part, table = part
+        builder.absorb(part)
+        tables.append(table)
+        if progress is not None:
+            progress(nbytes, len(part))
+
+    if workers <= 1:
+        # Shard by shard in this process, so only one shard is held as text or records at a time and
+        # progress is reported as the parse goes
+        view = memoryview(data)
+        for start, owned, end in shards:
+            take(parse_block_shard(parser, view[start:end], owned - start, blocks), owned - start)
+        return builder, join_blocks(tables) if blocks else None
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = deque()
+        for start, owned, end in shards:
+            # Workers get a copy of their shard only; memoryviews and mmaps can't be pickled anyway
+            pending.append((pool.submit(parse_block_shard, parser, bytes(data[start:end]), owned - start, blocks),
+                            owned - start))
+            # Keep a bounded number of shards in flight so memory stays flat
+            if len(pending) >= 2 * workers:
+                future, nbytes = pending.popleft()
+                take(future.result(), nbytes)
+        while pending:
+            future, nbytes = pending.popleft()
+            take(future.result(), nbytes)
+    return builder, join_blocks(tables) if blocks else None
+
+
+def parse_gazette_buffer(data, parser="regex", workers=None, progress=None, blocks=True):
+    """Parse a gazette held in memory (bytes, a memoryview of an upload, or an mmap) without copying it.
+
+    Returns the frame, the same as parse_gazette_file() gives, and its block
+    table. ``progress`` and ``blocks`` are as for parse_gazette_blocks().
+    """
+    if workers is None:
+        workers = default_workers()
+    with stage("parse", parser=parser, workers=workers):
+        builder, table = parse_gazette_blocks(data, parser, workers, progress, blocks)
+    with stage("build_frame", rows=len(builder)):
+        return builder.to_frame(), table
+
+
+def row_ranges(starts, counts):
+    # Row positions start..start+count-1 for each pair, concatenated
+    counts = np.asarray(counts, dtype=np.int64)
+    ends = np.cumsum(counts)
+    offsets = np.asarray(starts, dtype=np.int64) - (ends - counts)
+    return np.repeat(offsets, counts) + np.arange(ends[-1] if len(ends) else 0)
+
+
+def reparse_gazette(data, parser, previous):
+    """Parse a revision of a gazette, re-parsing only the record blocks that differ from an earlier revision.
+
+    ``previous`` is the earlier revision's frame and block table. Returns the
+    new frame (the same as a full parse would give), its block table, and the
+    diff: frames of the "added", "removed" and "changed" students. Returns
+    None if fewer than REVISION_MIN_SHARED of the blocks are in the earlier
+    revision, as the gazette is then not a revision of it at all.
+    """
+    old_df, (old_digests, old_counts) = previous
+    bounds, ends = split_blocks(data, CONTEXT_LINES[parser])
+    digests = block_digests(data, bounds, ends)
+
+    # Blocks already in the earlier revision take their students from it
+    order = np.argsort(old_digests, kind="stable")
+    known = old_digests[order]
+    position = np.minimum(np.searchsorted(known, digests), max(len(known) - 1, 0))
+    found = known[position] == digests if len(known) else np.zeros(len(digests), dtype=bool)
+    if not len(digests) or found.mean() < REVISION_MIN_SHARED:
+        return None
+    reused = order[position[found]]
+    changed = np.flatnonzero(~found)
+    builder, changed_counts = parse_blocks(parser, data, bounds, ends, changed.tolist())
+
+    old_starts = np.cumsum(old_counts, dtype=np.int64) - old_counts
+    counts = np.zeros(len(digests), dtype=np.uint32)
+    counts[found] = old_counts[reused]
+    counts[changed] = changed_counts
+    sources = np.zeros(len(digests), dtype=np.int64)
+    sources[found] = old_starts[reused]
+    sources[changed] = len(old_df) + np.cumsum(changed_counts, dtype=np.int64) - changed_counts
+
+    # Earlier rows followed by the re-parsed ones, then put in file order
+    merged = ColumnBuilder.from_frame(old_df).absorb(builder).to_frame()
+    df = merged.take(row_ranges(sources, counts)).reset_index(drop=True)
+
+    dropped = np.ones(len(old_digests), dtype=bool)
+    dropped[reused] = False
+    removed_rows = row_ranges(old_starts[dropped], old_counts[dropped])
+    diff = revision_diff(old_df.iloc[removed_rows], merged.iloc[len(old_df):])
+    return df, (digests, counts), diff
+
+
+def reissue_gazette(data, parser, old_df, workers=1):
+    """Parse a reissue of a gazette whose earlier revision was cached without a block table, and diff the two.
+
+    The gazette is parsed in full, building its block table for the next
+    reissue. Returns the frame, the block table and the diff as
+    reparse_gazette() does; the diff is None if fewer than
+    REVISION_MIN_SHARED of the students are in the earlier revision.
+    """
+    df, blocks = parse_gazette_buffer(data, parser, workers)
+    rolls = df["Roll No"]
+    if not len(rolls) or rolls.isin(old_df["Roll No"]).mean() < REVISION_MIN_SHARED:
+        return df, blocks, None
+    with stage("diff", rows=len(df)):
+        return df, blocks, revision_diff(old_df, df)
+
+
+def revision_diff(before, after):
+    """Students added, removed and changed, given the rows of the blocks that changed, before and after.
+
+    A Roll No found on both sides is "changed" if any of its fields differ;
+    one whose record moved unchanged is in neither side, so it is not reported.
+    """
+    old_rolls, new_rolls = before["Roll No"], after["Roll No"]
+    added = after[~new_rolls.isin(old_rolls)]
+    removed = before[~old_rolls.isin(new_rolls)]
+
+    old = before[old_rolls.isin(new_rolls)].drop_duplicates("Roll No").set_index("Roll No").astype(object)
+    new = after[new_rolls.isin(old_rolls)].drop_duplicates("Roll No").set_index("Roll No").astype(object)
+    new = new.loc[old.index]
+    same = (old == new) | (old.isna() & new.isna())
+    changed = after[new_rolls.isin(old.index[~same.all(axis=1).to_numpy()])].drop_duplicates("Roll No")
+    return {
+        "added": added.reset_index(drop=True),
+        "removed": removed.reset_index(drop=True),
+        "changed": changed.reset_index(drop=True),
+    }
+
+
+def school_name(data, fallback):
+    """School code and name from the gazette header, or ``fallback`` if there is none."""
+    header = bytes(data[:HEADER_SIZE]).decode("utf-8", errors="ignore")
+    match = SCHOOL_LINE.search(header)
+    if match is None:
+        return fallback
+    return f"{match.group(1)} {match.group(2).strip()}".strip()
+
+
+def parse_source(parser, name, data, progress=None):
+    builder, _ = parse_gazette_blocks(data, parser, 1, progress, blocks=False)
+    return builder, school_name(data, os.path.splitext(name)[0])
+
+
+def store_revision(cache, key, name, data, parser, df, blocks=None):
+    # Cache a parsed gazette, with its block table if it has one, as the revision later uploads of ``name`` are compared with
+    cache.put(key, df, blocks)
+    cache.set_latest(name, school_name(data, ""), parser, key)
+
+
+def parse_revision(cache, key, name, data, parser, revisions=None, workers=1):
+    """Parse ``data`` as a revision of the gazette last cached under the file name ``name`` for the same school.
+
+    Returns None if there is no earlier revision, or if too few of its record
+    blocks are in ``data`` for it to be one (see reparse_gazette()). The diff
+    against it is stored in ``revisions`` under ``name``, if given.
+
+    An earlier revision cached without a block table (a first upload) is
+    diffed with a full parse of ``data`` instead (see reissue_gazette()),
+    which then returns its frame even if the two turn out to share too few
+    students to be revisions of one gazette.
+    """
+    old_df, old_blocks = cache.previous(name, school_name(data, ""), parser) or (None, None)
+    if old_df is None:
+        return None
+    if old_blocks is None:
+        revision = reissue_gazette(data, parser, old_df, workers)
+    else:
+        with stage("reparse", parser=parser, rows=len(old_df)):
+            revision = reparse_gazette(data, parser, (old_df, old_blocks))
+    if revision is None:
+        return None
+    df, blocks, diff = revision
+    store_revision(cache, key, name, data, parser, df, blocks)
+    if revisions is not None and diff is not None:
+        revisions[name] = diff
+    return df
+
+
+def parse_batch(sources, parser="regex", workers=None, cache=None, revisions=None, progress=None):
+    """Parse several gazettes concurrently, one per worker, and merge them into one frame.
+
+    ``sources`` is a list of ``(file name, contents)`` pairs, the contents as
+    bytes or as a buffer such as upload_sources() and open_sources() give. A single source is
+    parsed as usual. With more than one, rows are tagged with their "Source File" and "School", and a Roll No
+    that appears in several files is kept only from the first file it appears in.
+    Returns the frame and the number of duplicate rows dropped.
+
+    With a ParseCache as ``cache``, each file is looked up by its content first
+    and only files not seen before are parsed. A file with the same name as
+    one parsed before is treated as a reissue of it, and if ``revisions`` is a
+    dict, the added, removed and changed students are stored in it under the
+    file name. First uploads are parsed in one pass, without the block table
+    that incremental reparsing needs; a gazette's first reissue is parsed in
+    full to build it, and after that only the record blocks that changed are
+    re-parsed.
+
+    ``progress``, if given, is called with the bytes consumed and the students
+    found as the parse goes, files found in the cache counting at once; it may
+    raise to stop the parse.
+    """
+    if workers is None:
+        workers = default_workers()
+
+    if len(sources) == 1:
+        name, data = sources[0]
+        key = cache and cache.key(data, parser)
+        df = cache and cache.get(key)
+        if df is None and cache:
+            df = parse_revision(cache, key, name, data, parser, revisions, workers)
+        if df is not None:
+            if progress is not None:
+                progress(len(data), len(df))
+            return df, 0
+        df, _ = parse_gazette_buffer(data, parser, workers, progress, blocks=False)
+        if cache:
+            store_revision(cache, key, name, data, parser, df)
+        return df, 0
+
+    keys = [cache and cache.key(data, parser) for _, data in sources]
+    parts = [None] * len(sources)
+    if cache:
+        for i, (name, data) in enumerate(sources):
+            df = cache.get(keys[i])
+            if df is None:
+                df = parse_revision(cache, keys[i], name, data, parser, revisions)
+            if df is not None:
+                parts[i] = ColumnBuilder.from_frame(df), school_name(data, os.path.splitext(name)[0])
+                if progress is not None:
+                    progress(len(data), len(df))
+    missing = [i for i, part in enumerate(parts) if part is None]
+
+    with stage("parse", parser=parser, files=len(missing), workers=workers):
+        if workers <= 1 or len(missing) <= 1:
+            results = {i: parse_source(parser, *sources[i], progress) for i in missing}
+        else:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(workers, len(missing)), mp_context=context) as pool:
+                futures = {i: pool.submit(parse_source, parser, sources[i][0], bytes(sources[i][1])) for i in missing}
+                results = {}
+                for i, future in futures.items():
+                    results[i] = future.result()
+                    # Worker processes can't call back; each file counts once it is done
+                    if progress is not None:
+                        progress(len(sources[i][1]), len(results[i][0]))
+    for i, part in results.items():
+        parts[i] = part
+
+    if cache:
+        for i in missing:
+            store_revision(cache, keys[i], *sources[i], parser, parts[i][0].to_frame())
+
+    with stage("merge", files=len(sources)):
+        return merge_parts(sources, parts)
+
+
+def merge_parts(sources, parts):
+    # One frame from per-file builders, tagged with file and school, keeping each Roll No's first row
+    builder = ColumnBuilder()
+    for part, _ in parts:
+        builder.absorb(part)
+    df = builder.to_frame()
+    if not sources:
+        return df, 0
+
+    counts = [len(part) for part, _ in parts]
+    df["Source File"] = pd.Categorical(np.repeat([name for name, _ in sources], counts))
+    df["School"] = pd.Categorical(np.repeat([school for _, school in parts], counts))
+
+    first_seen = ~df["Roll No"].duplicated()
+    dropped = len(df) - int(first_seen.sum())
+    if dropped:
+        df = df[first_seen].reset_index(drop=True)
+    return df, dropped
+
+
+def expand_paths(patterns):
+    """Gazette paths from file names and glob patterns, in the order given, each listed once."""
+    paths = {}
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        paths.update(dict.fromkeys(matches))
+    return list(paths)
+
+
+@contextmanager
+def upload_sources(uploaded_files):
+    """(file name, contents) pairs for parse_batch(), viewing each upload's in-memory buffer instead of copying it."""
+    with ExitStack() as stack:
+        yield [(f.name, stack.enter_context(f.getbuffer())) for f in uploaded_files]
+
+
+@contextmanager
+def open_sources(paths):
+    """(file name, contents) pairs for parse_batch(), with each file memory-mapped instead of read into memory."""
+    with ExitStack() as stack:
+        sources = []
+        for path in paths:
+            f = stack.enter_context(open(path, "rb"))
+            try:
+                data = stack.enter_context(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            except ValueError:
+                # Empty files can't be mapped
+                data = b""
+            sources.append((os.path.basename(path), data))
+        yield sources
+
+
+def parse_paths(patterns, parser="regex", workers=None, cache=None, revisions=None):
+    """parse_batch() over gazette files on disk, given as paths or glob patterns."""
+    with open_sources(expand_paths(patterns)) as sources:
+        return parse_batch(sources, parser, workers, cache, revisions)
@@ -0,0 +1,209 @@
+# Process-wide store of parsed datasets, shared read-only by every session that loads the same gazettes
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+# Seconds a dataset no session holds stays in memory, in case someone opens it again
+DATASET_TTL = float(os.environ.get("CBSE_DATASET_TTL", 30 * 60))
+
+# Memory for datasets no session holds; past it the least recently used are dropped first
+DATASET_MAX_MB = float(os.environ.get("CBSE_DATASET_MAX_MB", 1024))
+
+
+def value_nbytes(value):
+    # Memory held by the frames in a stored value
+    items = value if isinstance(value, tuple) else (value,)
+    return sum(int(item.memory_usage(deep=True).sum()) for item in items if isinstance(item, pd.DataFrame))
+
+
+def derived_nbytes(value):
+    # Memory owned by a structure built from a dataset; arrays viewing the dataset's own columns are counted there
+    total = 0
+    for item in vars(value).values():
+        if isinstance(item, np.ndarray) and item.base is None:
+            total += item.nbytes
+        elif isinstance(item, bytes):
+            total += len(item)
+    return total
+
+
+def read_only(value):
+    # Shallow copies share the stored columns; with copy-on-write (always on from pandas 3), changes to them never
+    # reach the stored frames. Dicts, such as the revisions a parse returns, are handed out as read-only views
+    if isinstance(value, tuple):
+        return tuple(read_only(item) for item in value)
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=False)
+    if isinstance(value, dict):
+        return MappingProxyType({key: read_only(item) for key, item in value.items()})
+    return value
+
+
+class Dataset:
+    """One stored value (a frame, with whatever details its parse returned) and the handles open on it.
+
+    Structures built from it (indexes and the like) are kept with it, by
+    name, and dropped with it.
+    """
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+        self.nbytes = value_nbytes(value)
+        self.refs = 0
+        self.last_used = time.monotonic()
+        self.derived = {}
+        # Reentrant, as building one structure may need another built first
+        self.derived_lock = threading.RLock()
+
+
+class DatasetHandle:
+    """A session's hold on a stored dataset; the dataset stays in memory until every handle is released.
+
+    A handle is released explicitly, or when it is garbage collected (e.g.
+    with the session state holding it).
+    """
+
+    def __init__(self, store, key):
+        self.key = key
+        self._store = store
+        self._release = weakref.finalize(self, store.release, key)
+
+    @property
+    def value(self):
+        """The stored value; its frames are shallow copies, so the stored ones can't be changed through them."""
+        return read_only(self._store.value(self.key))
+
+    @property
+    def frame(self):
+        value = self._store.value(self.key)
+        return read_only(value[0] if isinstance(value, tuple) else value)
+
+    def derived(self, name, build):
+        """The structure ``build()`` makes from this dataset, built once and dropped with the dataset."""
+        return self._store.derived(self.key, name, build)
+
+    @property
+    def released(self):
+        return not self._release.alive
+
+    def release(self):
+        self._release()
+
+
+class DatasetStore:
+    """Immutable datasets deduplicated by key and reference-counted by the handles sessions hold.
+
+    Datasets no handle refers to are kept for ``ttl`` seconds after last
+    use, and beyond ``max_bytes`` in total the least recently used of them
+    are dropped first. Datasets with open handles are never dropped, so
+    memory grows with the distinct gazettes in use, not with sessions.
+    """
+
+    def __init__(self, ttl=DATASET_TTL, max_bytes=DATASET_MAX_MB * (1 << 20)):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._datasets = OrderedDict()  # least recently used first
+        self._lock = threading.Lock()
+        self._loading = {}  # key -> lock held while that key is being loaded
+
+    def __len__(self):
+        return len(self._datasets)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._datasets
+
+    def open(self, key, load):
+        """Handle on the dataset stored under ``key``, calling ``load()`` for its value if it isn't stored yet.
+
+        Sessions opening the same key at once wait for a single load.
+        """
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+        try:
+            with loading:
+                with self._lock:
+                    dataset = self._datasets.get(key)
+                if dataset is None:
+                    dataset = Dataset(key, load())
+                with self._lock:
+                    dataset = self._datasets.setdefault(key, dataset)
+                    self._datasets.move_to_end(key)
+                    dataset.refs += 1
+                    dataset.last_used = time.monotonic()
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+        self.evict()
+        return DatasetHandle(self, key)
+
+    def value(self, key):
+        with self._lock:
+            dataset = self._datasets[key]
+            dataset.last_used = time.monotonic()
+            return dataset.value
+
+    def derived(self, key, name, build):
+        """``build()``'s result for the dataset stored under ``key``, built on first use and kept with the dataset.
+
+        Indexes kept in a cache of their own would hold on to the frames they
+        were built from after the dataset is dropped; kept here, they go with
+        it, and their memory counts toward ``max_bytes``.
+        """
+        with self._lock:
+            dataset = self._datasets[key]
+            dataset.last_used = time.monotonic()
+        with dataset.derived_lock:
+            value = dataset.derived.get(name)
+            if value is None:
+                value = dataset.derived[name] = build()
+                with self._lock:
+                    dataset.nbytes += derived_nbytes(value)
+        return value
+
+    def release(self, key):
+        with self._lock:
+            dataset = self._datasets.get(key)
+            if dataset is not None:
+                dataset.refs -= 1
+                dataset.last_used = time.monotonic()
+        self.evict()
+
+    def evict(self, now=None):
+        """Drop unheld datasets idle for longer than the TTL, then the least recently used while over the memory cap."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            idle = [dataset for dataset in self._datasets.values() if dataset.refs <= 0]
+            held = sum(dataset.nbytes for dataset in idle)
+            for dataset in idle:
+                if now - dataset.last_used > self.ttl or held > self.max_bytes:
+                    del self._datasets[dataset.key]
+                    held -= dataset.nbytes
+
+    def stats(self):
+        with self._lock:
+            return {
+                "datasets": len(self._datasets),
+                "handles": sum(dataset.refs for dataset in self._datasets.values()),
+                "mb": round(sum(dataset.nbytes for dataset in self._datasets.values()) / (1 << 20), 3),
+            }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def shared_store():
+    """The DatasetStore shared by every session in this process."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DatasetStore()
+        return _store
@@ -0,0 +1,94 @@
+# Deterministic synthetic CBSE gazettes, for benchmarks and for trying the apps without real results
+import argparse
+import random
+import sys
+
+FIRST_NAMES = [
+    "AARAV", "ADITI", "ANANYA", "ANJALI", "ARJUN", "DIYA", "ISHAAN", "KAVYA", "MOHAMMED", "NEHA",
+    "PRIYA", "RAHUL", "ROHAN", "SANYA", "VIHAAN", "D'SOUZA", "O'BRIEN", "D'CRUZ", "FATIMA", "JOSEPH",
+]
+LAST_NAMES = ["SHARMA", "KUMAR", "SINGH", "VERMA", "GUPTA", "KHAN", "NAIR", "REDDY", "D'MELLO", "DAS", ""]
+
+# Class 10 and 12 subject codes
+SUBJECT_CODES = ["002", "041", "085", "086", "087", "122", "184", "241", "301", "302",
+                 "027", "028", "030", "042", "043", "044", "048", "054", "055", "065", "083"]
+
+# Result weights, with the occasional result the parser does not know (counted as COMP)
+RESULTS = ["PASS"] * 14 + ["COMP"] * 3 + ["ESSENTIAL REPEAT", "ABST"]
+
+GRADES = ["A1", "A2", "B1", "B2", "C1", "C2", "D1", "D2", "E"]
+
+FIRST_ROLL = 12000000
+
+# Candidates per printed page; every page starts with a form feed and the page header
+PAGE_ROWS = 25
+
+HEADER = [
+    "CENTRAL BOARD OF SECONDARY EDUCATION",
+    "SECONDARY SCHOOL EXAMINATION (CLASS X) RESULT GAZETTE",
+    "SCHOOL : - 12345  KENDRIYA VIDYALAYA NO 1 DELHI CANTT",
+]
+COLUMN_HEADER = "ROLL NO    F NAME                                    SUB1    SUB2    SUB3    SUB4    SUB5    ADDL    RESULT"
+RULE = "-" * 110
+
+
+def grade(marks):
+    return GRADES[min(len(GRADES) - 1, (100 - marks) // 11)]
+
+
+def iter_gazette(candidates, seed=1, male_share=0.0):
+    """Lines of a synthetic gazette with ``candidates`` students; the same seed always gives the same text.
+
+    Each student has a roll line (roll number, gender flag, name, five or six
+    subject codes, result) followed by a line of marks and grades. The
+    parsers only read rows flagged F, so ``male_share`` of the students are
+    flagged M to exercise the rows they skip.
+    """
+    rng = random.Random(seed)
+    yield from HEADER
+    for i in range(candidates):
+        if i % PAGE_ROWS == 0:
+            yield ""
+            yield f"\x0cPAGE {i // PAGE_ROWS + 1}"
+            yield COLUMN_HEADER
+            yield RULE
+
+        gender = "M" if rng.random() < male_share else "F"
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}".strip()
+        subjects = rng.sample(SUBJECT_CODES, 6 if rng.random() < 0.3 else 5)
+        result = rng.choice(RESULTS)
+        marks = [rng.randint(8, 100) for _ in subjects]
+
+        yield f"{FIRST_ROLL + i:08d}   {gender} {name:<40}" + "".join(f"{code:<8}" for code in subjects) + f"  {result}"
+        yield (" " * 50 + "  ".join(f"{mark:03d} {grade(mark):<2}" for mark in marks)).rstrip()
+    yield ""
+    yield f"TOTAL CANDIDATES : {candidates}"
+
+
+def gazette_text(candidates, seed=1, male_share=0.0):
+    return "\n".join(iter_gazette(candidates, seed, male_share)) + "\n"
+
+
+def write_gazette(path, candidates, seed=1, male_share=0.0):
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        for line in iter_gazette(candidates, seed, male_share):
+            f.write(line)
+            f.write("\n")
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Write a deterministic synthetic CBSE gazette.")
+    arg_parser.add_argument("candidates", type=int, help="number of students")
+    arg_parser.add_argument("-o", "--output", help="output file (default: standard output)")
+    arg_parser.add_argument("-s", "--seed", type=int, default=1)
+    arg_parser.add_argument("--male-share", type=float, default=0.0, help="share of M rows, which the parsers skip")
+    args = arg_parser.parse_args(argv)
+
+    if args.output:
+        write_gazette(args.output, args.candidates, args.seed, args.male_share)
+    else:
+        sys.stdout.writelines(line + "\n" for line in iter_gazette(args.candidates, args.seed, args.male_share))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+# Streamlit widgets shared by the CBSE result extractor apps
+import functools
+import json
+import re
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from cbse_export import EXPORT_FORMATS, lazy_export
+from cbse_index import AggregateCube, FilterEngine, Rankings, SearchIndex, SubjectIndex
+from cbse_jobs import BACKGROUND_MB, CANCELLED, FAILED, shared_jobs
+from cbse_metrics import max_rss_mb, prometheus_text, stage
+from cbse_parser import roll_text
+from cbse_store import shared_store
+
+
+def download_button(label, df, dataset_key, view, file_stem, key):
+    """Download button with a format picker; the file is only built when the button is clicked.
+
+    ``key`` names the format picker so each button remembers its own choice across reruns.
+    """
+    format_column, button_column = st.columns([1, 3])
+    fmt = format_column.selectbox("Format", list(EXPORT_FORMATS), key=f"{key}_format", label_visibility="collapsed")
+    extension, mime, _ = EXPORT_FORMATS[fmt]
+    button_column.download_button(
+        label,
+        data=lazy_export(df, dataset_key, view, fmt),
+        file_name=f"{file_stem}.{extension}",
+        mime=mime
+    )
+
+
+def revision_notes(revisions):
+    """Say which uploads were re-parsed as reissues of an earlier upload, and list the students that changed."""
+    for name, diff in revisions.items():
+        counts = ", ".join(f"{len(changes)} {kind}" for kind, changes in diff.items())
+        with st.expander(f"🔁 {name} is a revision of an earlier upload: {counts}"):
+            for kind, changes in diff.items():
+                if len(changes):
+                    st.caption(kind.capitalize())
+                    st.dataframe(changes, hide_index=True)
+
+
+# Seconds between progress updates while an upload is parsed in the background
+PROGRESS_INTERVAL = 1.0
+
+
+def shared_dataset(parse):
+    """Decorator for an app's ``parse(uploaded_files, dataset_key)``: one read-only result per process, not per session.
+
+    Unlike st.cache_data, which hands every session its own unpickled copy,
+    results live once in the shared dataset store, keyed on the function
+    and the uploads' content digests. The session holds only a handle, in
+    st.session_state.dataset; it is released when the session loads other
+    uploads or ends. ``parse`` must return the frame first.
+
+    Uploads of BACKGROUND_MB or more are parsed on a background job instead;
+    until it is done the script shows its progress and stops there.
+    """
+    @functools.wraps(parse)
+    def load(uploaded_files, dataset_key):
+        key = (parse.__code__.co_filename, parse.__qualname__, tuple(digest for _, digest in dataset_key))
+        handle = st.session_state.get("dataset")
+        if handle is None or handle.released or handle.key != key:
+            if handle is not None:
+                handle.release()
+                st.session_state.dataset = None
+            store = shared_store()
+            total_bytes = sum(f.size for f in uploaded_files)
+            if key not in store and total_bytes >= BACKGROUND_MB * (1 << 20):
+                background_parse(key, lambda: parse(uploaded_files, dataset_key), total_bytes)
+            handle = store.open(key, lambda: parse(uploaded_files, dataset_key))
+            st.session_state.dataset = handle
+        return handle.value
+    return load
+
+
+def background_parse(key, load, total_bytes):
+    """Wait on the background job storing ``load()`` under ``key``: returns once it is done, else stops the script.
+
+    Reruns while the job runs (any widget, or the progress polling) find it
+    again rather than starting over, and sessions uploading the same files
+    share it. A job that failed or was cancelled is not restarted until asked.
+    A failed job's exception is raised here, for the app's own error handling
+    around the parse to show, as it would for a parse in the script thread.
+    """
+    job = st.session_state.get("parse_job")
+    if job is None or job.key != key:
+        if job is not None:
+            # Other uploads now; stop waiting on the old ones
+            job.cancel()
+            st.session_state.parse_job = None
+        stopped = st.session_state.get("stopped_parse")
+        if stopped is not None and stopped[0] == key:
+            st.warning(stopped[1])
+            if not st.button("🔁 Parse again", key="parse_again"):
+                st.stop()
+            del st.session_state["stopped_parse"]
+        job = st.session_state.parse_job = shared_jobs().submit(key, load, total_bytes)
+
+    if not job.done:
+        parse_progress(job)
+        st.stop()
+    st.session_state.parse_job = None
+    if job.state == CANCELLED:
+        st.session_state.stopped_parse = (key, "⏹️ Parsing was cancelled.")
+        st.rerun()
+    if job.state == FAILED:
+        st.session_state.stopped_parse = (key, f"Error parsing file: {job.error}")
+        raise job.error
+
+
+def parse_status(job):
+    """One line on a background parse: where it is in the queue, or how far it has got and how long is left."""
+    if job.started is None:
+        ahead = shared_jobs().ahead(job)
+        if not ahead:
+            return "Starting to parse…"
+        return f"Waiting for {ahead} other upload{'s' if ahead != 1 else ''} to be parsed…"
+    eta = job.eta()
+    left = f", about {eta:.0f}s left" if eta is not None else ""
+    return (f"Parsed {job.rows:,} students from {job.bytes_done / (1 << 20):.1f} "
+            f"of {job.total_bytes / (1 << 20):.1f} MB{left}")
+
+
+@st.fragment(run_every=PROGRESS_INTERVAL)
+def parse_progress(job):
+    """Progress bar and cancel button for a background parse, redrawn on their own until the job is done."""
+    if job.done:
+        # Rerun the whole app, which picks the dataset up from the shared store
+        st.rerun()
+    st.progress(job.fraction(), text=parse_status(job))
+    if st.button("✖️ Cancel parsing", key="cancel_parse"):
+        job.cancel()
+        st.session_state.parse_job = None
+        st.session_state.stopped_parse = (job.key, "⏹️ Parsing was cancelled.")
+        st.rerun()
+
+
+def derived(name, build):
+    # Built once per dataset in the shared store and dropped with it, so it never outlives the frame it indexes;
+    # a session without a stored dataset builds its own
+    handle = st.session_state.get("dataset")
+    if handle is None or handle.released:
+        return build()
+    return handle.derived(name, build)
+
+
+def subject_index(df):
+    """SubjectIndex of the session's parsed dataset ``df``, built on first use and shared by every rerun and session."""
+    def build():
+        with stage("subject_index", rows=len(df)):
+            return SubjectIndex(df)
+    return derived("subject_index", build)
+
+
+def aggregate_cube(df):
+    """AggregateCube behind the summary tables of the session's dataset ``df``, built once and shared."""
+    def build():
+        subjects = subject_index(df)
+        with stage("aggregate_cube", rows=len(df)):
+            return AggregateCube(df, subjects)
+    return derived("aggregate_cube", build)
+
+
+def rankings(df):
+    """Per-subject Rankings of the session's dataset ``df``, computed once and shared."""
+    def build():
+        subjects = subject_index(df)
+        with stage("rankings", rows=len(df)):
+            return Rankings(df, subjects)
+    return derived("rankings", build)
+
+
+def filter_engine(df):
+    """FilterEngine of the session's dataset ``df``, whose cached predicate masks every rerun and session reuses."""
+    return derived("filter_engine", lambda: FilterEngine(df, subject_index(df)))
+
+
+def search_index(df):
+    """SearchIndex of the session's dataset ``df``, built on first search and shared by every rerun and session."""
+    def build():
+        with stage("search_index", rows=len(df)):
+            return SearchIndex(df)
+    return derived("search_index", build)
+
+
+def search_rows(df, search):
+    """Rows of ``df`` whose roll number or name contains ``search``, else the closest names."""
+    index = search_index(df)
+    with stage("search"):
+        rows = index.search(search)
+        fuzzy = not len(rows)
+        if fuzzy:
+            rows = index.fuzzy(search)
+    if fuzzy and len(rows):
+        st.caption(f"No exact match for \"{search}\", showing the closest names.")
+    return df.iloc[rows]
+
+
+# Rows shown per page of a results table; only the page on screen is styled and sent to the browser
+PAGE_SIZE = 100
+
+# Row colours in order of precedence, matching the original highlight_row()
+ESSENTIAL_REPEAT_COLOUR = 'background-color: #ff9999'  # red
+COMP_COLOUR = 'background-color: #fff3cd'  # yellow
+LOW_PERCENTAGE_COLOUR = 'background-color: #ffcccc'  # pink
+
+
+def row_colours(df):
+    """CSS background for every row, worked out in one pass over the Result and Percentage columns."""
+    result = df['Result']
+    return np.select(
+        [(result == 'ESSENTIAL REPEAT').to_numpy(), (result == 'COMP').to_numpy(), (df['Percentage'] < 33).to_numpy()],
+        [ESSENTIAL_REPEAT_COLOUR, COMP_COLOUR, LOW_PERCENTAGE_COLOUR],
+        default=''
+    )
+
+
+def highlight_rows(df):
+    colours = row_colours(df)
+    return pd.DataFrame(np.repeat(colours[:, None], len(df.columns), axis=1), index=df.index, columns=df.columns)
+
+
+# Numeric table filters: a comparison (">= 60"), a range ("45-60") or a plain value
+NUMERIC_FILTER = re.compile(r"(<=|>=|<|>|=)?\s*(-?\d+(?:\.\d+)?)(?:\s*-\s*(-?\d+(?:\.\d+)?))?")
+COMPARISONS = {"<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal, "=": np.equal}
+
+NO_SORT = "(original order)"
+
+
+def filter_rows(df, column, text):
+    """Rows of ``df`` whose ``column`` matches ``text``: a number filter for numeric columns, else a substring."""
+    values = df[column]
+    if pd.api.types.is_numeric_dtype(values):
+        match = NUMERIC_FILTER.fullmatch(text)
+        if match is None:
+            st.caption(f"Use a number, a comparison like \">= 60\" or a range like \"45-60\" to filter {column}.")
+            return df
+        op, low, high = match.groups()
+        numbers = values.to_numpy()
+        if high is not None:
+            mask = (numbers >= float(low)) & (numbers <= float(high))
+        else:
+            mask = COMPARISONS[op or "="](numbers, float(low))
+    elif isinstance(values.dtype, pd.CategoricalDtype):
+        # Match the few categories, then pick rows by code
+        hits = values.cat.categories.str.lower().str.contains(text.lower(), regex=False)
+        mask = np.isin(values.cat.codes.to_numpy(), np.flatnonzero(hits))
+    else:
+        mask = values.astype(str).str.lower().str.contains(text.lower(), regex=False).to_numpy()
+    return df[mask]
+
+
+def page_rows(df, key, page_size=PAGE_SIZE):
+    """The slice of ``df`` for the page picked above the table, with a caption giving the total row count."""
+    total = len(df)
+    pages = max(1, -(-total // page_size))
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > pages:
+        # The table shrank (e.g. a new search) since this page was picked
+        st.session_state[page_key] = 1
+
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key=page_key)
+    start = (page - 1) * page_size
+    end = min(start + page_size, total)
+    st.caption(f"Showing rows {start + 1 if total else 0}–{end} of {total}")
+    return df.iloc[start:end]
+
+
+def paged_table(df, key, highlight=False, page_size=PAGE_SIZE):
+    """Results table that sorts and filters on the server and sends only the page on screen to the browser.
+
+    With ``highlight``, ESSENTIAL REPEAT / COMP / <33% rows are coloured; styling also covers the visible page only.
+    """
+    sort_column, order_column, filter_column, value_column = st.columns([2, 1, 2, 2])
+    sort_by = sort_column.selectbox("Sort by", [NO_SORT, *df.columns], key=f"{key}_sort")
+    descending = order_column.selectbox("Order", ["Ascending", "Descending"], key=f"{key}_order") == "Descending"
+    filter_by = filter_column.selectbox("Filter column", list(df.columns), key=f"{key}_filter_column")
+    value = value_column.text_input("Filter value", key=f"{key}_filter").strip()
+
+    with stage("sort_filter", table=key):
+        if value:
+            df = filter_rows(df, filter_by, value)
+        if sort_by != NO_SORT:
+            df = df.sort_values(sort_by, ascending=not descending, kind="stable")
+
+    page = page_rows(df, key, page_size)
+    if "Roll No" in page.columns:
+        # Roll No is stored as uint32; the page on screen gets its leading zeros back
+        page = page.assign(**{"Roll No": roll_text(page["Roll No"])})
+    with stage("render_table", table=key, rows=len(page)):
+        if highlight:
+            st.dataframe(page.style.apply(highlight_rows, axis=None), use_container_width=True)
+        else:
+            st.dataframe(page, use_container_width=True)
+
+
+def metrics_sidebar(run):
+    """Finish recording this rerun and, when switched on, show its stages in the sidebar with log and metric downloads."""
+    run.finish()
+    if not st.sidebar.toggle("🐞 Performance details", key="metrics_debug"):
+        return
+
+    st.sidebar.caption(f"This rerun took {run.wall_s:.3f}s; peak process memory {max_rss_mb()} MB")
+    store = shared_store().stats()
+    st.sidebar.caption(f"Shared datasets: {store['datasets']} in memory ({store['mb']} MB), "
+                       f"{store['handles']} session handles")
+    jobs = shared_jobs().stats()
+    st.sidebar.caption(f"Background parses: {jobs['running']} running, {jobs['queued']} queued")
+    if run.stages:
+        stages = pd.DataFrame(run.stages)
+        st.sidebar.dataframe(stages.drop(columns="max_rss_mb"), use_container_width=True, hide_index=True)
+    else:
+        st.sidebar.caption("No stages ran in this rerun.")
+    st.sidebar.download_button("Download rerun log (JSON)", data=json.dumps(run.as_dict()) + "\n",
+                               file_name="cbse_rerun.json", mime="application/json")
+    st.sidebar.download_button("Download Prometheus metrics", data=prometheus_text(),
+                               file_name="cbse_metrics.prom", mime="text/plain")
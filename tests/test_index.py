@@ -0,0 +1,114 @@
+# Indexes checked against the pandas code the apps ran before them, on synthetic gazettes
+import numpy as np
+import pandas as pd
+import pytest
+
+from cbse_index import TIER_BINS, TIER_LABELS, AggregateCube, FilterEngine, Rankings, SearchIndex, SubjectIndex
+from cbse_parser import SUBJECT_SLOTS, parse_gazette
+from cbse_synth import gazette_text
+
+
+@pytest.fixture(scope="module")
+def df():
+    return parse_gazette(gazette_text(2000, seed=5))
+
+
+@pytest.fixture(scope="module")
+def subjects(df):
+    return SubjectIndex(df)
+
+
+@pytest.fixture(scope="module", params=["all", "subset"])
+def within(request, df):
+    return df if request.param == "all" else df.iloc[::3]
+
+
+def subject_averages(df):
+    # Each Sub1..Sub5 column averaged on its own, then the slot averages averaged
+    slots = []
+    for slot in range(1, SUBJECT_SLOTS + 1):
+        codes = df[f"Sub{slot} Code"].astype(object)
+        averages = df[f"Sub{slot} Marks"].groupby(codes).mean()
+        slots.append(averages.rename_axis("Subject Code").rename("Average Marks").reset_index())
+    return pd.concat(slots).groupby("Subject Code")["Average Marks"].mean()
+
+
+def test_subject_averages(df, subjects, within):
+    expected = subject_averages(within)
+    for table in (subjects.averages(within), AggregateCube(df, subjects).subject_averages(within)):
+        got = table.set_index(table["Subject Code"].astype(str))["Average Marks"]
+        pd.testing.assert_series_equal(got.sort_index(), expected.sort_index(), check_names=False, check_index_type=False)
+        assert table["Average Marks"].is_monotonic_decreasing
+
+
+def test_counts(df, subjects, within):
+    cube = AggregateCube(df, subjects)
+    results = cube.result_counts(within)
+    expected = within["Result"].astype(object).value_counts()
+    assert dict(zip(results["Result"].astype(str), results["Count"])) == {
+        result: expected.get(result, 0) for result in results["Result"].astype(str)
+    }
+    tiers = pd.cut(within["Percentage"], bins=TIER_BINS, labels=TIER_LABELS, right=False).value_counts().sort_index()
+    assert cube.tier_counts(within)["Count"].tolist() == tiers.tolist()
+    assert cube.tiers(within).astype(object).equals(
+        pd.cut(within["Percentage"], bins=TIER_BINS, labels=TIER_LABELS, right=False).astype(object).rename("Performance Tier")
+    )
+
+
+def test_subject_students_and_ranks(df, subjects, within):
+    ranks = Rankings(df, subjects)
+    for code in subjects.subjects():
+        students = ranks.students(code)
+        marks = students["Marks"].to_numpy().astype(int)
+        # Competition ranks and the share of students at or below each mark, among everyone who sat it
+        np.testing.assert_array_equal(students["Rank"], (marks[None, :] > marks[:, None]).sum(axis=1) + 1)
+        percentiles = np.round(100 * (marks[None, :] <= marks[:, None]).sum(axis=1) / len(marks), 1)
+        np.testing.assert_allclose(students["Percentile"], percentiles)
+        assert students.head(10).equals(ranks.students(code, top=10))
+
+        # Highest marks first, ties in frame order, as a stable sort of the subject's rows gives
+        sat = [within.loc[within[f"Sub{slot} Code"] == code, ["Roll No", f"Sub{slot} Marks"]]
+               .set_axis(["Roll No", "Marks"], axis=1) for slot in range(1, SUBJECT_SLOTS + 1)]
+        expected = pd.concat(sat).sort_index(kind="stable").sort_values("Marks", ascending=False, kind="stable")
+        got = ranks.students(code, within=within)
+        assert got["Roll No"].tolist() == expected["Roll No"].tolist()
+        assert got["Marks"].tolist() == expected["Marks"].tolist()
+
+
+@pytest.mark.parametrize("predicates", [
+    [("percentage", 40, 80)],
+    [("result", "PASS", "COMP")],
+    [("subject", "041", 60)],
+    [("roll", 12000100, 12000900), ("not", ("result", "PASS"))],
+    [("any", ("subject", "002", 90), ("percentage", 95, 100))],
+])
+def test_filters(df, subjects, within, predicates):
+    def expected(kind, *args):
+        if kind == "percentage":
+            return df["Percentage"].between(*args)
+        if kind == "result":
+            return df["Result"].isin(args)
+        if kind == "subject":
+            code, min_marks = args
+            return np.logical_or.reduce([(df[f"Sub{slot} Code"] == code) & (df[f"Sub{slot} Marks"] >= min_marks)
+                                         for slot in range(1, SUBJECT_SLOTS + 1)])
+        if kind == "roll":
+            return df["Roll No"].between(*args)
+        if kind == "any":
+            return np.logical_or.reduce([expected(*predicate) for predicate in args])
+        return ~expected(*args[0])
+
+    mask = np.logical_and.reduce([np.asarray(expected(*predicate)) for predicate in predicates])
+    got = FilterEngine(df, subjects).select(*predicates, within=within)
+    pd.testing.assert_frame_equal(got, df[mask & df.index.isin(within.index)])
+
+
+@pytest.mark.parametrize("query", ["sharma", "12000", "a", "d'c", "12000100-12000199", "zzz"])
+def test_search(df, query):
+    rolls = df["Roll No"].map("{:08d}".format)
+    if "-" in query and query[0].isdigit():
+        first, last = query.split("-")
+        expected = rolls.between(first, last)
+    else:
+        expected = rolls.str.contains(query, regex=False) | df["Name"].str.lower().str.contains(query, regex=False)
+    assert SearchIndex(df).search(query).tolist() == np.flatnonzero(expected.to_numpy()).tolist()
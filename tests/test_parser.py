@@ -0,0 +1,166 @@
+# Parser paths checked against parse_gazette() on synthetic gazettes; the two parsers differ on purpose (the scan
+# parser keeps tfri.py's rules), so each path is compared with parse_gazette() for the same parser
+import io
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cbse_parser
+from cbse_cache import ParseCache
+from cbse_export import export_bytes, text_rolls
+from cbse_parser import parse_batch, parse_gazette, parse_gazette_buffer, parse_gazette_file
+from cbse_synth import gazette_text
+
+PARSERS = ["regex", "scan"]
+
+
+@pytest.fixture(scope="module")
+def text():
+    return gazette_text(300, seed=3, male_share=0.1)
+
+
+def small_shards(monkeypatch, shard_size):
+    # parse_gazette_blocks() cuts shards with the module's iter_block_shards()
+    iter_block_shards = cbse_parser.iter_block_shards
+    monkeypatch.setattr(cbse_parser, "iter_block_shards",
+                        lambda data, context_lines: iter_block_shards(data, context_lines, shard_size))
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+@pytest.mark.parametrize("blocks", [True, False])
+def test_buffer_matches_reference(text, parser, blocks):
+    expected = parse_gazette(text, parser)
+    df, table = parse_gazette_buffer(text.encode(), parser, workers=1, blocks=blocks)
+    pd.testing.assert_frame_equal(df, expected)
+    if blocks:
+        digests, counts = table
+        assert len(digests) == len(counts) and counts.sum() == len(df)
+    else:
+        assert table is None
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_file_matches_reference(text, parser):
+    df = parse_gazette_file(io.BytesIO(text.encode()), parser, chunk_size=4096, workers=1)
+    pd.testing.assert_frame_equal(df, parse_gazette(text, parser))
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+@pytest.mark.parametrize("blocks", [True, False])
+@pytest.mark.parametrize("shard_size", [1, 500, 4096, 20000])
+def test_shard_boundaries(monkeypatch, text, parser, blocks, shard_size):
+    small_shards(monkeypatch, shard_size)
+    data = text.encode()
+    steps = []
+    df, table = parse_gazette_buffer(data, parser, workers=1, blocks=blocks,
+                                     progress=lambda nbytes, rows: steps.append((nbytes, rows)))
+    pd.testing.assert_frame_equal(df, parse_gazette(text, parser))
+    # Every byte and every student is reported once, however the shards fall
+    assert sum(nbytes for nbytes, _ in steps) == len(data)
+    assert sum(rows for _, rows in steps) == len(df)
+    if blocks:
+        assert table[1].sum() == len(df)
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+@pytest.mark.parametrize("newline", ["\r\n", "\r"])
+def test_line_breaks_and_non_ascii(monkeypatch, text, parser, newline):
+    # Accented names (which the regex parser skips) and a non-ASCII line on every page, so no path can take
+    # the ASCII-only byte scan
+    names = text.replace("ANANYA", "ANANYÄ").replace("KAVYA", "KÁVYA ÉÉ").replace("\x0cPAGE", "PRÜFUNG é\n\x0cPAGE")
+    variant = names.replace("\n", newline)
+    expected = parse_gazette(names, parser)
+    assert len(expected)
+
+    pd.testing.assert_frame_equal(parse_gazette(variant, parser), expected)
+    data = variant.encode()
+    for blocks in (True, False):
+        pd.testing.assert_frame_equal(parse_gazette_buffer(data, parser, workers=1, blocks=blocks)[0], expected)
+    pd.testing.assert_frame_equal(parse_gazette_file(io.BytesIO(data), parser, chunk_size=1000, workers=1), expected)
+    small_shards(monkeypatch, 700)
+    for blocks in (True, False):
+        pd.testing.assert_frame_equal(parse_gazette_buffer(data, parser, workers=1, blocks=blocks)[0], expected)
+
+
+def student_lines(lines, roll):
+    # Index of a student's roll line; their marks line follows it
+    return next(i for i, line in enumerate(lines) if line.startswith(f"{roll:08d}"))
+
+
+def rolls(frame):
+    return sorted(int(roll) for roll in frame["Roll No"])
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_revisions(tmp_path, text, parser):
+    cache = ParseCache(str(tmp_path))
+    lines = text.split("\n")
+
+    # A reissue renaming one student: no block table yet, so it is parsed in full and diffed
+    renamed = lines.copy()
+    i = student_lines(renamed, 12000010)
+    renamed[i] = renamed[i].replace(" F ", " F ZED", 1)
+    second = "\n".join(renamed)
+
+    # Then one student dropped, one added and one's marks changed, re-parsing only those blocks
+    revised = renamed.copy()
+    i = student_lines(revised, 12000030)
+    revised[i + 1] = re.sub(r"\d{3}", "007", revised[i + 1], count=1)
+    i = student_lines(revised, 12000020)
+    added = [revised[i].replace("12000020", "12999999", 1), revised[i + 1]]
+    del revised[i:i + 2]
+    revised[i:i] = added
+    third = "\n".join(revised)
+
+    revisions = {}
+    for version in (text, second, third):
+        df, duplicates = parse_batch([("g.txt", version.encode())], parser, 1, cache, revisions)
+        pd.testing.assert_frame_equal(df, parse_gazette(version, parser))
+        assert duplicates == 0
+
+    # Only the last diff is kept per file name
+    diff = revisions["g.txt"]
+    assert rolls(diff["added"]) == [12999999]
+    assert rolls(diff["removed"]) == [12000020]
+    assert rolls(diff["changed"]) == [12000030]
+    assert cache.previous("g.txt", cbse_parser.school_name(third.encode(), ""), parser)[1] is not None
+
+    # The reissue's diff, from a fresh cache
+    revisions = {}
+    cache = ParseCache(str(tmp_path / "fresh"))
+    for version in (text, second):
+        parse_batch([("g.txt", version.encode())], parser, 1, cache, revisions)
+    diff = revisions["g.txt"]
+    assert rolls(diff["changed"]) == [12000010]
+    assert diff["added"].empty and diff["removed"].empty
+
+
+def test_xlsx_roundtrip(text):
+    pytest.importorskip("openpyxl")
+    df = parse_gazette(text)
+    df.loc[5, "Name"] = "A & B <C>"
+    df.loc[7, "Percentage"] = np.nan
+    df["Source File"] = pd.Categorical(["x&y.txt"] * len(df))
+    df["Flag"] = df["Total"] > 300
+
+    expected = text_rolls(df)
+    texts = [name for name, column in expected.items() if not pd.api.types.is_numeric_dtype(column)]
+    back = pd.read_excel(io.BytesIO(export_bytes(df, "Excel")), dtype=dict.fromkeys(texts, str))
+    assert list(back.columns) == list(expected.columns)
+    assert back["Roll No"].iloc[0] == f"{int(df['Roll No'].iloc[0]):08d}"
+    for name, column in expected.items():
+        if name in texts or pd.api.types.is_bool_dtype(column):
+            assert back[name].fillna("").astype(str).tolist() == column.astype(object).fillna("").astype(str).tolist(), name
+        else:
+            np.testing.assert_allclose(back[name].astype(float), column.astype(float), err_msg=name)
+
+
+def test_xlsx_empty_and_header():
+    openpyxl = pytest.importorskip("openpyxl")
+    df = parse_gazette(gazette_text(3))
+    assert pd.read_excel(io.BytesIO(export_bytes(df.iloc[:0], "Excel"))).columns.tolist() == df.columns.tolist()
+    sheet = openpyxl.load_workbook(io.BytesIO(export_bytes(df, "Excel"))).active
+    assert sheet["A1"].value == "Roll No" and sheet["A1"].font.b
+    assert sheet.max_row == len(df) + 1